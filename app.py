@@ -1,376 +1,641 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, abort, render_template, request, send_file
 from flask_socketio import SocketIO, emit, join_room
-from game_logic.player import TichuPlayer
 from game_logic.game import TichuGame
-from game_logic.card import TichuCard
-from game_logic.combo import Combo
-import traceback
-from game_logic.Helpers import card_to_filename
+from game_logic.card import card_from_key
+import functools
+import logging
+from eventlet import patcher, tpool
+from eventlet.semaphore import Semaphore
+from tables import TableManager
+from table_store import store_from_url
+from dispatcher import Dispatcher, spectator_room
+from game_logic.events import GameMessage, GrandTichuRequested, PassingComplete, RoundOver, MatchOver
+from game_logic.advisor import TichuAdvisor
+from game_logic.bots import LEVELS
+from bot_seats import BotSeats, pool_context, wait_for_pool
+from assets import Assets, MAX_AGE
+from lobby import Lobby
+from results_store import ResultsStore
+from game_logic.metrics import metrics
+from game_logic.gamelog import GameLog
+from game_logic.snapshot import MAX_TARGET_SCORE
 import os
+import time
+import uuid
+
+# TICHU_LOG_LEVEL=DEBUG shows the engine's decisions, the default keeps the event loop free of console I/O
+logging.basicConfig(level=os.environ.get("TICHU_LOG_LEVEL", "WARNING").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s %(message)s")
+log = logging.getLogger("tichu.server")
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tichu-secret'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', ping_interval=3600, ping_timeout=7200)
-
-players = []
-sid_to_player = {}
-sid_order = []
-game = None
+# script, styles and the card atlas under content-hashed names, cached for a year
+assets = Assets(app.static_folder)
+app.jinja_env.globals["asset_url"] = assets.url
+# With several workers/nodes the Socket.IO messages fan out through a message queue (e.g. redis://...)
+# and the tables live in a shared store, see table_store.py
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', ping_interval=25, ping_timeout=20,
+                    message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE"))
+
+# a dropped player keeps the seat for this long (seconds), see handle_resume()
+RESUME_GRACE = float(os.environ.get("TICHU_RESUME_GRACE", "120"))
+# tables nobody acted on for this long are evicted, e.g. a finished round nobody is ready for
+IDLE_TTL = float(os.environ.get("TICHU_IDLE_TTL", "1800"))
+REAP_INTERVAL = float(os.environ.get("TICHU_REAP_INTERVAL", "30"))
+# TICHU_EVICT_DIR=evicted keeps a binary snapshot (see game_logic/snapshot.py) of every evicted game
+EVICT_DIR = os.environ.get("TICHU_EVICT_DIR")
+if EVICT_DIR:
+    os.makedirs(EVICT_DIR, exist_ok=True)
+# a match ends once a team has TICHU_TARGET_SCORE points and leads
+TARGET_SCORE = int(os.environ.get("TICHU_TARGET_SCORE", TichuGame.TARGET_SCORE))
+if not 0 < TARGET_SCORE <= MAX_TARGET_SCORE:
+    raise ValueError(f"TICHU_TARGET_SCORE must be between 1 and {MAX_TARGET_SCORE}, not {TARGET_SCORE}")
+# the next round starts this many seconds after the last one ended, or as soon as every player is ready
+NEXT_ROUND_DELAY = float(os.environ.get("TICHU_NEXT_ROUND_DELAY", "20"))
+# player names are short: they go into every snapshot with a one-byte length (see game_logic/snapshot.py)
+MAX_NAME_LENGTH = 24
+# TICHU_ADMIN_TOKEN=... enables /admin/tables?token=...
+ADMIN_TOKEN = os.environ.get("TICHU_ADMIN_TOKEN")
+
+# one lock per table, green so that a waiting action does not block the eventlet hub
+tables = TableManager(store_from_url(os.environ.get("TICHU_TABLE_STORE"), lock_factory=Semaphore, sleep=socketio.sleep),
+                      lock_factory=Semaphore)
+dispatcher = Dispatcher(socketio)
+# matchmaking, seats the players who asked for any table in batches
+lobby = Lobby(lambda sid, name: seat_from_queue(sid, name))
+
+# TICHU_GAME_LOG_DIR=logs keeps an append-only log per table, python -m game_logic.replay rebuilds a game from it
+GAME_LOG_DIR = os.environ.get("TICHU_GAME_LOG_DIR")
+if GAME_LOG_DIR:
+    os.makedirs(GAME_LOG_DIR, exist_ok=True)
+journals = {}   # room -> GameLog
+
+# TICHU_RESULTS_DB=results.db keeps every finished round and the leaderboard in SQLite, see results_store.py
+RESULTS_DB = os.environ.get("TICHU_RESULTS_DB")
+results = ResultsStore(RESULTS_DB) if RESULTS_DB else None
+
+# Monte Carlo estimate of a hand for the Grand Tichu and Tichu calls, in worker processes
+# (TICHU_ADVISOR_PROCESSES=0 plays the samples in a server thread, =off disables the advice)
+ADVISOR_PROCESSES = os.environ.get("TICHU_ADVISOR_PROCESSES", "2")
+advisor = None
+if ADVISOR_PROCESSES != "off":
+    # estimates may run on tpool threads, so an OS lock even where gunicorn monkey-patched threading
+    advisor = TichuAdvisor(processes=int(ADVISOR_PROCESSES), lock_factory=patcher.original("threading").Lock,
+                           mp_context=pool_context())
+    advise = functools.partial(wait_for_pool if advisor.processes else tpool.execute, advisor.estimate)
+
+# bot seats decide in worker processes, within a time budget per move (TICHU_BOT_PROCESSES=0: in a server thread)
+bots = BotSeats(lambda *decision: apply_bot_action(*decision), socketio.start_background_task,
+                processes=int(os.environ.get("TICHU_BOT_PROCESSES", "2")),
+                budget=float(os.environ.get("TICHU_BOT_BUDGET", "0.25")))
+
+
+def warm_up_pools():
+    """Starts the worker processes before the first call, one pool after the other (not from two green threads)."""
+    if advisor is not None:
+        advisor.warm_up()
+    bots.warm_up()
+
+
+socketio.start_background_task(wait_for_pool, warm_up_pools)
+
+metrics.gauge("tables", lambda: len(tables))
+metrics.gauge("players", lambda: len(tables.sid_to_room))
+metrics.gauge("open_tables", lambda: len(tables.open_tables))
+metrics.gauge("lobby_waiting", lambda: len(lobby))
+metrics.gauge("spectators", lambda: len(tables.watching))
+if results is not None:
+    metrics.gauge("results_pending", lambda: results.pending.qsize())
+metrics.gauge("table_memory_bytes", lambda: sum(t.memory_usage()["total"] for t in list(tables.tables.values())))
 
 
 @app.route('/')
 def index():
-    return render_template('index.html')
-
-
-@socketio.on('join')
-def handle_join(data):
-    print("JOIN RECEIVED:", data)
-    global game
-    name = data['name']
-    team = data["team"]
-    sid = request.sid
-    print(f"{name} joined with SID: {sid}")
-
-    if sid in sid_to_player:
+    return render_template('index.html', atlas=assets.atlas)
+
+
+@app.route('/assets/<name>')
+def asset(name):
+    path = assets.paths.get(name)
+    if path is None:
+        abort(404)
+    response = send_file(path, max_age=MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/leaderboard')
+def leaderboard():
+    if results is None:
+        abort(404)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return {"players": tpool.execute(results.leaderboard, limit)}
+
+
+@app.route('/players/<name>')
+def player_stats(name):
+    stats = tpool.execute(results.player, name) if results is not None else None
+    if stats is None:
+        abort(404)
+    return stats
+
+
+@app.route('/metrics')
+def metrics_route():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/admin/tables')
+def admin_tables():
+    """The tables resident in this process, with their idle time and memory."""
+    if not ADMIN_TOKEN or request.args.get('token') != ADMIN_TOKEN:
+        return Response("Not found", status=404)
+    now = time.time()
+    resident = [{
+        "room": table.room,
+        "players": [{"name": p.name, "connected": bool(p.sid), "bot": p.bot} for p in table.players],
+        "round": table.game.round_number if table.game else None,
+        "idle_seconds": round(now - table.last_active, 1),
+        "memory": table.memory_usage(),
+    } for table in list(tables.tables.values())]
+    return {"tables": resident, "memory_bytes": sum(t["memory"]["total"] for t in resident)}
+
+
+def evict_table(room, now):
+    """Evicts one table if it is still idle or abandoned, and tells its players and spectators."""
+    table = tables.evict(room, now, IDLE_TTL, RESUME_GRACE)
+    if table is None:
         return
+    reason = "abandoned" if table.is_abandoned() else "idle"
+    log.info("table evicted table=%s reason=%s", room, reason)
+    metrics.inc("tables_evicted_total", reason=reason)
+    if EVICT_DIR and table.game is not None:
+        with open(os.path.join(EVICT_DIR, f"{room}.snap"), "wb") as f:
+            f.write(table.game.to_bytes())
+    drop_journal(room)
+    socketio.emit('table_closed', {'table': room}, to=[room, spectator_room(room)])
+    socketio.close_room(room)
+    socketio.close_room(spectator_room(room))
+
+
+def reap_tables():
+    """Evicts idle and abandoned tables every REAP_INTERVAL seconds."""
+    while True:
+        socketio.sleep(REAP_INTERVAL)
+        now = time.time()
+        for room in tables.idle_rooms(now, IDLE_TTL, RESUME_GRACE):
+            try:
+                evict_table(room, now)
+            except Exception:
+                log.exception("evicting table failed table=%s", room)    # the other tables are still reaped
 
-    player = TichuPlayer(name, team=team, sid=sid)
-    players.append(player)
-    sid_to_player[sid] = player
-    print(sid_to_player)
-    sid_order.append(sid)
 
-    socketio.emit('game_message', {'message': f"{name} has joined Team {team}."})
+socketio.start_background_task(reap_tables)
 
-    if len(players) == 4:
-        start_game()
 
+def timed(handler):
+    """Records the latency of a Socket.IO handler in the handler_seconds histogram."""
+    event = handler.__name__.removeprefix("handle_")
 
-def start_game():
-    global game
-    game = TichuGame(players, socketio)
-    game.start_new_round()
+    @functools.wraps(handler)
+    def wrapper(*args):
+        with metrics.timer("handler_seconds", event=event):
+            return handler(*args)
+    return wrapper
 
-    # Send initial hands to each player
-    game.send_hands_to_players()
 
-    socketio.emit('game_message', {'message': "All cards have been dealt. Begin passing phase."})
+def journal_for(table):
+    if not GAME_LOG_DIR:
+        return None
+    journal = journals.get(table.room)
+    if journal is None:
+        journal = journals[table.room] = GameLog(os.path.join(GAME_LOG_DIR, f"{table.room}.log"))
+    return journal
 
-    socketio.emit("start_passing_cards", )
 
-    current_player = game.get_current_player()
-    for player in game.players:
-        sid = player.sid
-        socketio.emit("turn_update", {
-            "current": current_player.name,
-            "you": player.name
-        }, room=sid)
+def table_event(handler):
+    """
+    Runs handler(table, player, data) for the sender's table while it is checked out,
+    reports rule violations to the sender and flushes the events of the action once.
 
+    The table stays locked until the events are sent, so every client sees the
+    actions of a table in the order they were applied. Clients number their
+    actions (data["seq"]); a number that was applied already is a resent message
+    and ignored. The acknowledgement tells the client which action it belongs to.
+    """
+    event = handler.__name__.removeprefix("handle_")
+    ACTIONS[event] = handler
+
+    @functools.wraps(handler)
+    def wrapper(data=None):
+        with metrics.timer("handler_seconds", event=event):
+            ack = run(data if isinstance(data, dict) else {})
+        metrics.inc("actions_total", event=event, result=ack.pop('result'))
+        return ack
+
+    def run(data):
+        seq = data.get('seq')
+        with tables.session(request.sid) as (table, player):
+            if not player:
+                emit('error_message', {'message': 'Player not found.'})
+                return {'seq': seq, 'ok': False, 'result': 'no_player'}
+            if table.game is None:
+                emit('error_message', {'message': 'The game has not started yet.'})
+                return {'seq': seq, 'ok': False, 'result': 'no_game'}
+            if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+                emit('error_message', {'message': 'Invalid action number.'})
+                return {'seq': seq, 'ok': False, 'result': 'rejected'}
+            if not table.accept_seq(player, seq):
+                return {'seq': seq, 'ok': False, 'duplicate': True, 'result': 'duplicate'}
+            result, error = apply_action(table, player, event, data)
+            if error:
+                emit('error_message', {'message': error})
+        return {'seq': seq, 'ok': result == 'ok', 'result': result}
+    return wrapper
+
+
+ACTIONS = {}    # event -> handler(table, player, data), filled by @table_event
+
+
+def apply_action(table, player, event, data):
+    """
+    Applies one action of a human or a bot to the checked out table and sends its events.
+    Returns the result ('ok', 'rejected' or 'error') and the message for the player.
+    """
+    table.game.journal = journal_for(table)
+    result, error = 'ok', None
+    try:
+        ACTIONS[event](table, player, data)
+    except ValueError as e:
+        result, error = 'rejected', str(e)
+        log.debug("action rejected event=%s player=%s reason=%s", event, player.name, e)
+    except Exception as e:
+        result, error = 'error', str(e)
+        log.exception("action failed event=%s player=%s", event, player.name)
+    if tables.store is not None and table.game.journal:
+        table.game.journal.flush()     # the next action may run on another worker
+    events = table.game.take_events()
+    dispatcher.flush(table, events)
+    after_action(table, events)
+    return result, error
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    sid = request.sid
-    player = sid_to_player.get(sid)
-    if player:
-        print(f"{player.name} disconnected.")
-        players.remove(player)
-        del sid_to_player[sid]
-        sid_order.remove(sid)
-        socketio.emit('game_message', {'message': f"{player.name} has left the game."})
 
+def after_action(table, events):
+    offer_advice(table, events)
+    record_results(table, events)
+    schedule_next_round(table, events)
+    bots.schedule(table)
 
-@socketio.on('play_card')
-def handle_play_card(data):
-    sid = request.sid
-    player = sid_to_player.get(sid)
-    if not player:
-        emit('error_message', {'message': 'Player not found.'})
-        return
-    if game.get_current_player() != player:
-        emit('error_message', {'message': "Not your turn!"})
-        return
 
-    if player in game.finished_players:
-        emit('error_message', {'message': "You are finished already!"})
-        game.advance_turn()
+def record_results(table, events):
+    if results is None:
         return
+    for event in events:
+        if isinstance(event, RoundOver):
+            results.record_round(table.match_id, table.room, event.result)
+        elif isinstance(event, MatchOver):
+            results.record_match(table.match_id, event.winner, event.scores,
+                                 [(p.name, p.team, p.bot) for p in table.players])
 
-    game.pass_count = 0  # sobald jemand spielt, werden Pässe zurückgesetzt
 
-    card_filenames = data.get('cards', [])
-    try:
-        cards = filenames_to_cards(card_filenames, player.hand)
+def schedule_next_round(table, events):
+    if table.game is not None and table.game.winner is None and any(isinstance(e, RoundOver) for e in events):
+        socketio.start_background_task(next_round_after_delay, table.room, table.game.round_number)
 
-        if not game.valid_play(cards):
-            emit('error_message', {'message': 'Invalid play!'})
-            return
 
-        player.has_played = True
-        game.wish = None
-
-        if any(c.name.lower() == "mah jong" for c in cards):
-            game.waiting_for_wish = True
-            socketio.emit("ask_wish", room=player.sid)
-
-        if any(c.name.lower() == "dog" for c in cards):
-            partner = [p for p in game.players if p.team == player.team and p != player][0]
-            # game.turn_index = game.players.index(partner)
-            game.advance_turn()
-            game.advance_turn()
-            # TODO: das muss noch ordentlich implementiert werden
-            socketio.emit('game_message', {'message': f"{player.name} plays the Dog! Turn goes to {partner.name}."})
-            player.remove_cards(cards)
-            current = game.get_current_player()
-            socketio.emit('turn_update', {'current': current.name, "you": player.name}, room=sid)
+def next_round_after_delay(room, round_number):
+    """Starts the next round NEXT_ROUND_DELAY seconds after round_number ended, unless every player was ready sooner."""
+    socketio.sleep(NEXT_ROUND_DELAY)
+    # touch=False: a table that only moves on by itself still counts as idle for the reaper
+    with tables.checkout(room, touch=False) as table:
+        if table is None or table.game is None or table.is_abandoned():
+            return
+        if table.game.round_number != round_number or not table.game.is_round_over() or table.game.winner:
+            return
+        table.ready_players.clear()
+        table.game.journal = journal_for(table)
+        table.game.start_next_round()
+        if tables.store is not None and table.game.journal:
+            table.game.journal.flush()
+        events = table.game.take_events()
+        dispatcher.flush(table, events)
+        after_action(table, events)
+
+
+def apply_bot_action(room, name, event, data, state):
+    """Applies a bot decision, unless the table changed since the bot looked at it."""
+    with tables.checkout(room) as table:
+        bots.done(room)
+        if table is None or table.game is None:
             return
+        player = table.game.get_player_by_name(name)
+        if not player.bot or table.game.to_bytes() != state:
+            bots.schedule(table)    # decide again on the current state
+            return
+        result, error = apply_action(table, player, event, data)
+        metrics.inc("bot_actions_total", event=event, result=result)
+        if error:
+            log.warning("bot action %s event=%s player=%s: %s", result, event, name, error)
 
-        player.remove_cards(cards)
-        game.current_trick.append({'combo': Combo(cards, game), 'player': player})
-        if len(player.hand) == 0:
-            game.finished_players.append(player)
-            if len(game.finished_players) >= len(game.players) - 1:
-                round_points = game.calculate_round_points()
-                socketio.emit('round_over', {"scores": game.team_scores, "round_points": round_points})
-                return
-
-        # Broadcast the played cards to all
-        image_filenames = [card_to_filename(c) for c in cards]
-        socketio.emit('last_played', {'cards': image_filenames})
-        if len(cards) == 1 and cards[0].name.lower() == "phoenix":
-            rank = game.current_trick[-1]["combo"].rank
-            socketio.emit('game_message', {'message': f"Phoenix was played as single with rank: {rank}"})
-
-        game.send_hands_to_players()  # Update everyone’s hand
-        game.advance_turn()
-        current = game.get_current_player()
-        for player in game.players:
-            sid = player.sid
-            socketio.emit('turn_update', {'current': current.name, "you": player.name}, room=sid)
 
-    except Exception as e:
-        traceback.print_exc()
-        emit('error_message', {'message': str(e)})
+@socketio.on('join')
+@timed
+def handle_join(data):
+    """
+    {name} waits for a seat from matchmaking, {name, table} joins a table by its code,
+    {name, create: true} opens a private table, with bots: level filled with bots at once,
+    {name, table, spectate: true} watches a table. Teams follow the seats.
+    """
+    name = data.get('name')
+    sid = request.sid
+    code = data.get('table')
+    log.info("join name=%s sid=%s table=%s", name, sid, code)
 
+    if tables.room_of(sid) or sid in tables.watching or sid in lobby.waiting:
+        return
 
-def filenames_to_cards(filenames, hand):
-    matched_cards = []
-    for filename in filenames:
-        name = filename.replace(".png", "")
-        if "_" in name:
-            suit, card_name = name.split("_")
-        else:
-            suit = None
-            card_name = name
-        # Suche passende Karte im Hand-Objekt
-        for card in hand:
-            if card.name == card_name and card.suit == suit:
-                matched_cards.append(card)
-                break
+    try:
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Please enter a name.")
+        name = name.strip()
+        if len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f"Names have at most {MAX_NAME_LENGTH} characters.")
+        if data.get('spectate'):
+            watch_table(sid, name, code)
+        elif code or data.get('create'):
+            seat_player(sid, name, room=code, private=not code, bots=data.get('bots'))
         else:
-            raise ValueError(f"Card {filename} not found in hand.")
-    return matched_cards
+            emit('queued', {'position': lobby.enqueue(sid, name)})
+    except ValueError as e:
+        emit('error_message', {'message': str(e)})
 
 
-@socketio.on('pass')
-def handle_pass():
-    global game
-
-    sid = request.sid
-    player = sid_to_player.get(sid)
-    if not player:
-        emit('error_message', {'message': 'Player not found.'})
+def seat_player(sid, name, room=None, private=False, bots=None):
+    """Seats a player and starts the game once the table is full, inside or outside of a request."""
+    if bots is not None and bots not in LEVELS:
+        raise ValueError(f"Unknown bot level {bots}.")
+    enter = functools.partial(enter_table, sid)
+    with tables.join(sid, name, room=room, private=private, enter=enter) as (table, player):
+        events = [GameMessage(f"{player.name} has joined Team {player.team}.")]
+        if bots:
+            events += fill_with_bots(table, bots)
+        if table.is_full():
+            start_game(table)
+            events += table.game.take_events()
+        socketio.emit('joined_table', {'table': table.room, 'token': table.issue_token(player), 'team': player.team,
+                                       'name': player.name}, to=sid)
+        dispatcher.flush(table, events)
+        after_action(table, events)
+
+
+def enter_table(sid, room):
+    """Puts sid in the room of a table before it takes a seat, a player who left meanwhile does not."""
+    if not socketio.server.manager.is_connected(sid, '/'):
+        raise ValueError("The connection was closed.")
+    socketio.server.enter_room(sid, room, namespace='/')
+
+
+def seat_from_queue(sid, name):
+    # the lobby took sid off its queue, it may have disconnected since and cancel() no longer finds it
+    if not socketio.server.manager.is_connected(sid, '/'):
         return
+    try:
+        seat_player(sid, name)
+    except ValueError as e:
+        socketio.emit('error_message', {'message': str(e)}, to=sid)
 
-    if game.get_current_player() != player:
-        emit('error_message', {'message': "Not your turn!"})
-        return
 
-    if not game or not game.current_trick:
-        emit('error_message', {'message': 'Nothing to pass on yet.'})
-        return
+socketio.start_background_task(lobby.run, socketio.sleep)
+
+
+def watch_table(sid, name, room):
+    table = tables.watch(sid, room)
+    log.info("watch name=%s table=%s", name, room)
+    join_room(spectator_room(room))
+    emit('joined_table', {'table': room, 'spectator': True})
+    if table.game is not None:
+        emit('snapshot', table.game.public_snapshot())
 
-    game.pass_count += 1
-    socketio.emit('game_message', {'message': f"{player.name} has passed."})
 
-    if game.pass_count >= (len(game.players) - len(game.finished_players)):
-        # Trick endet, letzter Spieler gewinnt
-        winning_combo = game.current_trick[-1]["combo"]
-        winner = game.current_trick[-1]["player"]
-        socketio.emit('game_message', {'message': f"{winner.name} wins the trick with {winning_combo}."})
+@socketio.on('list_tables')
+def handle_list_tables(data=None):
+    """The open tables for the lobby and the number of players waiting for matchmaking."""
+    return {'tables': tables.list_open(), 'waiting': len(lobby)}
 
-        if winning_combo.contains_dragon and len(game.finished_players) < 3:
-            game.dragon_possible_recipients = [p.name for p in game.players if p.team != winner.team]
-            game.waiting_for_dragon_choice = True
-            game.dragon_winner = winner
-            socketio.emit("choose_dragon_recipient", {"recipients": game.dragon_possible_recipients}, room=winner.sid)
+
+@socketio.on('add_bots')
+@timed
+def handle_add_bots(data=None):
+    """Fills the free seats of the sender's table with bots and starts the game."""
+    level = (data or {}).get('level', 'medium')
+    if level not in LEVELS:
+        emit('error_message', {'message': f"Unknown bot level {level}."})
+        return
+    with tables.session(request.sid) as (table, player):
+        if not player or table.game is not None:
+            emit('error_message', {'message': 'Bots can only join a table that has not started yet.'})
             return
+        events = fill_with_bots(table, level)
+        start_game(table)
+        events += table.game.take_events()
+        dispatcher.flush(table, events)
+        after_action(table, events)
+
+
+def fill_with_bots(table, level):
+    events = []
+    while not table.is_full():
+        bot = table.add_bot(level)
+        events.append(GameMessage(f"{bot.name} ({level}) has joined."))
+    tables.set_open(table, False)
+    return events
+
+
+def start_game(table):
+    table.game = TichuGame(table.players, room=table.room, target_score=TARGET_SCORE)
+    table.match_id = uuid.uuid4().hex
+    journal = journal_for(table)
+    if journal:
+        table.game.attach_journal(journal)
+    table.game.start()
+    if journal and tables.store is not None:
+        journal.flush()
+
+
+def offer_advice(table, events):
+    """Sends every player an estimate of their hand when a Grand Tichu or a Tichu call is due."""
+    for event in events:
+        if isinstance(event, GrandTichuRequested):
+            kind = 'grand'
+        elif isinstance(event, PassingComplete):
+            kind = 'tichu'
         else:
-            winner.add_trick([card for card in [trick["combo"].cards for trick in game.current_trick]])
-        game.current_trick = []
-        game.pass_count = 0
+            continue
+        for player in table.humans():
+            send_advice(player.sid, kind, player.hand)
+        return
 
-        if winner not in game.finished_players:
-            game.turn_index = game.players.index(winner)  # Winner spielt weiter
-            socketio.emit('turn_message', {'message': f"{winner.name} starts next trick."})
-        else:
-            for _ in range(4):
-                next_player = game.players[(game.players.index(winner) + 1) % len(players)]
-                if next_player not in game.finished_players:
-                    game.turn_index = game.players.index(next_player)  # Winner spielt weiter
-                    socketio.emit('turn_message', {'message': f"{next_player.name} starts next trick."})
-                    break
 
-    else:
-        game.advance_turn()
-        current = game.get_current_player()
-        for player in game.players:
-            sid = player.sid
-            socketio.emit('turn_update', {'current': current.name, "you": player.name}, room=sid)
+def send_advice(sid, kind, hand):
+    """Estimates the hand off the event loop and sends the result to sid only."""
+    if advisor is None:
+        return
+    cards = list(hand)      # the hand may change while the samples run
+
+    def run():
+        with metrics.timer("advisor_seconds", kind=kind):
+            advice = advise(cards)
+        metrics.inc("advice_total", kind=kind, cached=advice.cached)
+        socketio.emit('tichu_advice', dict(advice.to_dict(), kind=kind), to=sid)
+    socketio.start_background_task(run)
 
 
-@socketio.on('wish_card')
-def handle_wish(data):
-    wish = data['wish']
-    if wish == "None":
-        game.waiting_for_wish = False
-        socketio.emit('game_message', {'message': "Nothing was wished for."})
+@socketio.on('disconnect')
+@timed
+def handle_disconnect():
+    sid = request.sid
+    lobby.cancel(sid)
+    if tables.unwatch(sid):
         return
-    game.wish = wish
-    game.waiting_for_wish = False
-    socketio.emit('game_message', {'message': f"Wish for {data['wish']}."})
+    with tables.leave(sid) as (table, player):
+        if player:
+            log.info("disconnect name=%s table=%s", player.name, table.room)
+            if table.is_empty():
+                drop_journal(table.room)
+            elif table.game is None:
+                dispatcher.flush(table, [GameMessage(f"{player.name} has left the game.")])
+            else:
+                dispatcher.flush(table, [GameMessage(f"{player.name} has lost the connection, a bot plays on.")])
+                bots.schedule(table)
+
+
+def drop_journal(room):
+    journal = journals.pop(room, None)
+    if journal:
+        journal.flush()
+
+
+@socketio.on('resume')
+@timed
+def handle_resume(data=None):
+    """
+    Takes the seat of a session token (from 'joined_table') back after a reconnect
+    and sends the state in one snapshot. The ack tells the client the sequence
+    number of its last applied action, so its numbering continues from there.
+    """
+    token = (data or {}).get('token')
+    if not isinstance(token, str) or tables.room_of(request.sid):
+        return {'ok': False}
+    with tables.resume(request.sid, token) as (table, player):
+        if player is None:
+            return {'ok': False}
+        log.info("resume name=%s table=%s", player.name, table.room)
+        join_room(table.room)
+        emit('joined_table', {'table': table.room, 'token': token})
+        events = [GameMessage(f"{player.name} is back.")]
+        if table.game is not None:
+            emit('snapshot', table.game.snapshot(player))
+            events += table.game.prompts(player)    # the Grand Tichu, passing, wish or dragon prompt still open
+        dispatcher.flush(table, events)
+        bots.schedule(table)
+        return {'ok': True, 'name': player.name, 'seq': table.last_seq.get(player.name, 0)}
 
 
-@socketio.on('dragon_recipient_selected')
-def handle_dragon_recipient_selected(data):
-    recipient_name = data.get('recipient')
-    winner = getattr(game, 'dragon_winner', None)
-    if not winner:
-        return
+@socketio.on('play_card')
+@table_event
+def handle_play_card(table, player, data):
+    cards = cards_in_hand(data.get('cards', []), player)
+    table.game.play_cards(player, cards)
 
-    recipient = next((p for p in game.dragon_possible_recipients if p == recipient_name), None)     # p is the name
-    if not recipient:
-        emit('error_message', {'message': 'Invalid recipient'})
-        return
 
-    # Stich geben
-    for p in game.players:
-        if p.name == recipient_name:
-            p.add_trick(
-                [card for trick in game.current_trick for card in trick["combo"].cards]
-            )
-            socketio.emit('game_message', {'message': f"{winner.name} gives the Dragon trick to {p.name}."})
+def cards_in_hand(keys, player):
+    """Resolves the card ids or filenames sent by a client to cards of the player's hand."""
+    cards = []
+    for key in keys:
+        card = card_from_key(key)
+        if not player.has_card(card):
+            raise ValueError(f"Card {key} not found in hand.")
+        cards.append(card)
+    return cards
 
-    # Aufräumen
-    game.waiting_for_dragon_choice = False
-    game.dragon_winner = None
-    game.dragon_possible_recipients = None
 
-    # Nächste Runde starten
-    game.current_trick = []
-    game.pass_count = 0
-    game.turn_index = game.players.index(winner)  # Winner spielt weiter
-    socketio.emit('turn_message', {'message': f"{winner.name} starts next trick."})
+@socketio.on('pass')
+@table_event
+def handle_pass(table, player, data):
+    table.game.pass_turn(player)
 
 
-ready_players = set()
+@socketio.on('wish_card')
+@table_event
+def handle_wish(table, player, data):
+    table.game.set_wish(player, data.get('wish'))
 
 
-@socketio.on("ready_for_next_round")
-def handle_ready():
-    sid = request.sid
-    player = sid_to_player[sid]
-    ready_players.add(player)
+@socketio.on('dragon_recipient_selected')
+@table_event
+def handle_dragon_recipient_selected(table, player, data):
+    table.game.give_dragon_trick(player, data.get('recipient'))
 
-    if len(ready_players) == len(game.players):
-        ready_players.clear()
-        game.start_new_round()
-        game.send_hands_to_players()
-        socketio.emit("game_message", {"message": f"Runde {game.round_number} beginnt!"})
 
+@socketio.on('request_snapshot')
+@table_event
+def handle_request_snapshot(table, player, data):
+    emit('snapshot', table.game.snapshot(player))
+
+
+@socketio.on("ready_for_next_round")
+@table_event
+def handle_ready(table, player, data):
+    """Ready for the next round, or after the end of a match for a new match with the same seats."""
+    if not table.game.is_round_over():
+        raise ValueError("The round is still being played.")
+    table.ready_players.add(player)
+
+    if all(p in table.ready_players for p in table.humans()):      # bots are always ready
+        table.ready_players.clear()
+        if table.game.winner is not None:
+            start_game(table)
+        else:
+            table.game.start_next_round()
 
-@socketio.on("grand_tichu_choice")
-def handle_grand_tichu_choice(data):
-    sid = request.sid
-    player = sid_to_player[sid]
-    choice = data.get("choice")  # True oder False
-    player.called_grand_tichu = choice
-    if choice:
-        socketio.emit("game_message", {"message": f"{player.name} declares a GRAND Tichu!"})
-    else:
-        socketio.emit("game_message", {"message": f"{player.name} reaches for their cards."})
 
-    # Prüfen ob alle entschieden haben
-    if all(p.called_grand_tichu is not None for p in game.players):
-        game.deal_remaining_cards()
-        game.send_hands_to_players()
+@socketio.on("grand_tichu_choice")
+@table_event
+def handle_grand_tichu_choice(table, player, data):
+    table.game.grand_tichu_choice(player, data.get("choice"))  # True oder False
 
 
 @socketio.on("tichu_call")
-def handle_tichu_call(data):
-    sid = request.sid
-    player = sid_to_player.get(sid)
-    if not player:
-        emit("error_message", {"message": "Player not found"})
-        return
+@table_event
+def handle_tichu_call(table, player, data):
+    table.game.call_tichu(player)
 
-    player.called_tichu = True
-    socketio.emit("game_message", {"message": f"{player.name} has called Tichu!"})
+
+@socketio.on("request_tichu_advice")
+@table_event
+def handle_request_tichu_advice(table, player, data):
+    if len(player.hand) not in (8, 14):
+        raise ValueError("Advice is only available for your first 8 or your full 14 cards.")
+    send_advice(player.sid, 'grand' if len(player.hand) == 8 else 'tichu', player.hand)
 
 
 @socketio.on("pass_cards")
-def handle_pass_cards(data):
+@table_event
+def handle_pass_cards(table, from_player, data):
     """
-    Nimmt die Zuordnung {cardId: targetPlayerId} entgegen
+    Nimmt die Zuordnung {targetPlayerId: cardId} entgegen
     und führt den Kartenübergang aus.
     """
+    # Beispiel: assignments = { "p2": "K_spades", "p3": "5_hearts", "p4": "Dog" }
     assignments = data.get("assignments", {})
+    if not isinstance(assignments, dict):
+        raise ValueError("Pass one card to each of the other three players.")
+    cards = cards_in_hand(assignments.values(), from_player)
+    assignments = dict(zip(assignments, cards))
 
-    # Beispiel: assignments = { "spades_13": "p2", "hearts_5": "p3", "diamonds_7": "p4" }
-
-    from_player = sid_to_player[request.sid]
-    from_player.passed_cards = True
-
-    for target_id, card_id in assignments.items():
-        if "_" in card_id:
-            rank_str, suit = card_id.split("_")
-            rank_map = {"J": 11,"Q": 12,"K": 13,"A": 14}
-            try:
-                rank = int(rank_str)  # für 2–10
-            except ValueError:
-                rank = rank_map.get(rank_str, None)  # für J, Q, K,
-            if rank is None:
-                raise ValueError(f"Unbekannter Kartenwert: {rank_str}")
-            # Karte im Spieler-Objekt finden
-            card = next((c for c in from_player.hand if c.suit == suit and c.rank == rank), None)
-        else:
-            card = next((c for c in from_player.hand if c.name == card_id), None)
-        if card:
-            from_player.hand.remove(card)
-            target_player = get_player_by_name(target_id)
-            target_player.hand.append(card)
-            target_player.passing_info.append({"card": card, "player": from_player.name})
-            target_player.hand.sort()
-
-    # Optional: Prüfen, ob alle Spieler fertig sind → Passing-Phase beenden
-    if all(player.passed_cards for player in game.players):
-        socketio.emit("passing_complete")
-        # Jetzt geht's mit normalem Spielstart weiter
-        game.set_starting_player_index()
-        socketio.emit('turn_message', {'message': f"{game.players[game.turn_index]} starts next trick."})
-        # Beispiel: nach Abschluss des Passen-Vorgangs
-        game.send_hands_to_players()
-        # Game messages erstellen
-        for p in game.players:
-            for entry in p.passing_info:
-                message = f"You received {entry['card']} from {entry['player']}"
-                socketio.emit("game_message", {"message": message}, room=p.sid)
-
-
-def get_player_by_name(player_name):
-    for p in game.players:
-        if p.name == player_name:
-            return p
+    table.game.pass_cards(from_player, assignments)
 
 
 #if __name__ == '__main__':
@@ -381,4 +646,8 @@ def get_player_by_name(player_name):
 
 if __name__ == "__main__":
     import eventlet
-    eventlet.wsgi.server(eventlet.listen(('', int(os.environ.get("PORT", 5000)))), app)
+    import socket
+    listener = eventlet.listen(('', int(os.environ.get("PORT", 5000))))
+    # small websocket frames go out at once instead of waiting for Nagle/delayed ACK (~40 ms per action)
+    listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    eventlet.wsgi.server(listener, app)
@@ -0,0 +1,38 @@
+# assets.py
+#
+# Content-hashed URLs for the files the page loads: /assets/script.3f2a9c1d0b.js.
+# The name changes with the content, so the responses can be cached for a year
+# and a deploy still reaches every browser at once.
+
+import hashlib
+import json
+import os
+
+MAX_AGE = 365 * 24 * 3600
+
+
+class Assets:
+    def __init__(self, static_dir, files=("script.js", "styles.css", "dist/cards.webp")):
+        self.urls = {}      # file below static_dir -> url
+        self.paths = {}     # hashed name -> path
+        for name in files:
+            path = os.path.join(static_dir, name)
+            if os.path.exists(path):
+                self.add(name, path)
+        self.atlas = None   # index of the card atlas (see build_assets.py), with the url of the image
+        index = os.path.join(static_dir, "dist", "cards.json")
+        if os.path.exists(index) and "dist/cards.webp" in self.urls:
+            with open(index) as f:
+                self.atlas = json.load(f)
+            self.atlas["image"] = self.urls["dist/cards.webp"]
+
+    def add(self, name, path):
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:10]
+        stem, ext = os.path.splitext(os.path.basename(name))
+        hashed = f"{stem}.{digest}{ext}"
+        self.paths[hashed] = path
+        self.urls[name] = f"/assets/{hashed}"
+
+    def url(self, name):
+        return self.urls[name]
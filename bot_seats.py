@@ -0,0 +1,128 @@
+# bot_seats.py
+
+import logging
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from eventlet import patcher, tpool
+from game_logic.bots import LEVELS, GreedyBot, TunableBot, decide, pending_decisions
+from game_logic.game import TichuGame
+from game_logic.metrics import metrics
+
+log = logging.getLogger("tichu.bots")
+
+
+def wait_for_pool(fn, *args):
+    """
+    Calls fn, which waits for a process pool, without holding up the event loop.
+    Under a monkey-patched eventlet (gunicorn's eventlet worker) the pool's threads,
+    locks and queues are green: they only work from the hub's thread, where waiting
+    on them already yields to the other green threads. Otherwise fn waits in tpool.
+    """
+    if patcher.is_monkey_patched("thread"):
+        return fn(*args)
+    return tpool.execute(fn, *args)
+
+
+def pool_context():
+    """
+    The multiprocessing context for a process pool, None for the default. A worker
+    forked from a green thread would run the parent's other green threads (the
+    server's accept loop among them) whenever it blocks, so a monkey-patched
+    process starts fresh interpreters for its workers instead.
+    """
+    return multiprocessing.get_context("spawn") if patcher.is_monkey_patched("thread") else None
+
+
+def decide_snapshot(state, seat, decision, strength, seed):
+    """Runs in a worker process: the decision of the bot in seat for a game snapshot (see game.to_bytes())."""
+    game = TichuGame.from_bytes(state)
+    return decide(game, game.players[seat], decision, TunableBot(random.Random(seed), strength))
+
+
+def ready():
+    """Runs in a worker process, once it has imported this module."""
+    return True
+
+
+def fallback(state, seat, decision):
+    """The decision of a plain GreedyBot, for a bot that ran out of time."""
+    game = TichuGame.from_bytes(state)
+    return decide(game, game.players[seat], decision, GreedyBot(random.Random()))
+
+
+class BotSeats:
+    """
+    Plays the bot seats of every table of this process.
+
+    After every action schedule() looks at what the table waits for. A decision
+    of a bot runs in a worker process on a snapshot of the game, with a time
+    budget per move; the event loop only waits for it (see wait_for_pool()). The
+    answer comes back as the event and data a client would send, apply() feeds
+    it through the same handler as a human action. A table has at most one
+    bot decision under way, so its bots act one after the other.
+
+    processes=0 decides in a tpool thread of the server process instead.
+    """
+
+    def __init__(self, apply, spawn, processes=2, budget=0.25):
+        self.apply = apply      # apply(room, player name, event, data, snapshot), with the table checked out
+        self.spawn = spawn      # starts a green thread
+        self.processes = processes
+        self.budget = budget
+        # built once, here: under monkey patching it is driven from the hub's thread only
+        self.pool = ProcessPoolExecutor(processes, mp_context=pool_context()) if processes else None
+        self.busy = set()       # rooms with a bot decision under way
+        self.rng = random.Random()
+
+    def schedule(self, table):
+        """Starts the next bot decision of a checked out table, if it waits for one."""
+        if table.game is None or table.room in self.busy or table.is_abandoned():
+            return      # bots wait for at least one human
+        for decision, player in pending_decisions(table.game):
+            if player.bot:
+                self.busy.add(table.room)
+                self.spawn(self._run, table.room, player.name, table.game.players.index(player), decision,
+                           LEVELS[player.bot], table.game.to_bytes())
+                return
+
+    def warm_up(self):
+        """Starts the worker processes, so the first decisions do not run out of time."""
+        if self.processes:
+            for future in [self.pool.submit(ready) for _ in range(self.processes)]:
+                future.result()
+
+    def done(self, room):
+        """Called by apply() once the decision of room is applied or dropped."""
+        self.busy.discard(room)
+
+    def _run(self, room, name, seat, decision, strength, state):
+        try:
+            with metrics.timer("bot_decision_seconds", decision=decision):
+                wait = wait_for_pool if self.processes else tpool.execute
+                event, data = wait(self._decide, state, seat, decision, strength)
+        except Exception:
+            log.exception("bot decision failed table=%s player=%s decision=%s", room, name, decision)
+            self.busy.discard(room)
+            return
+        self.apply(room, name, event, data, state)
+
+    def _decide(self, state, seat, decision, strength):
+        seed = self.rng.getrandbits(32)
+        if not self.processes:
+            return decide_snapshot(state, seat, decision, strength, seed)
+        start = time.perf_counter()
+        future = self.pool.submit(decide_snapshot, state, seat, decision, strength, seed)
+        try:
+            return future.result(timeout=self.budget)
+        except TimeoutError:
+            future.cancel()
+            metrics.inc("bot_timeouts_total", decision=decision)
+            log.warning("bot decision out of time after %.3fs decision=%s", time.perf_counter() - start, decision)
+            return fallback(state, seat, decision)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,72 @@
+# build_assets.py
+#
+# Build step for the card images: packs the 56 faces from static/cards (plus the
+# card back) into one atlas, static/dist/cards.webp, and writes its index
+# static/dist/cards.json. The client draws every card from the atlas by its
+# integer id instead of loading a PNG per card. Needs Pillow, at build time only:
+#
+#   pip install Pillow
+#   python build_assets.py
+#
+# The server serves the atlas like every other asset under a content-hashed
+# name (see assets.py), so rebuild and commit both files after changing a card image.
+
+import argparse
+import json
+import os
+from game_logic.card import DECK
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:     # build time only, the server never needs it
+    Image = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(HERE, "static", "cards")
+DIST = os.path.join(HERE, "static", "dist")
+BACK = "back_dark.png"
+CELL = (128, 180)   # 1.5x the 120 px the cards are shown at
+COLUMNS = 15
+
+
+def build(source=SOURCE, dist=DIST, cell=CELL, columns=COLUMNS, quality=90):
+    if Image is None:
+        raise SystemExit("The asset build needs Pillow: pip install Pillow")
+    files = [card.filename for card in DECK] + [BACK]    # position = card index, the back last
+    rows = -(-len(files) // columns)
+    atlas = Image.new("RGBA", (cell[0] * columns, cell[1] * rows), (0, 0, 0, 0))
+    frames = []
+    for n, filename in enumerate(files):
+        with Image.open(os.path.join(source, filename)) as image:
+            # the special cards come in another aspect ratio, fit() crops them to the cell
+            face = ImageOps.fit(image.convert("RGBA"), cell, Image.LANCZOS)
+        x, y = cell[0] * (n % columns), cell[1] * (n // columns)
+        atlas.paste(face, (x, y))
+        frames.append([x, y])
+
+    os.makedirs(dist, exist_ok=True)
+    atlas.save(os.path.join(dist, "cards.webp"), quality=quality, method=6)
+    index = {
+        "image": "cards.webp",
+        "size": list(atlas.size),
+        "cell": list(cell),
+        "frames": frames[:len(DECK)],   # frames[card id] = [x, y] of its face
+        "back": frames[-1],
+        "names": [card.id for card in DECK],
+    }
+    with open(os.path.join(dist, "cards.json"), "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the card atlas")
+    parser.add_argument("--quality", type=int, default=90, help="WebP quality")
+    args = parser.parse_args()
+    index = build(quality=args.quality)
+    size = os.path.getsize(os.path.join(DIST, "cards.webp"))
+    print(f"{len(index['frames'])} cards + back in a {index['size'][0]}x{index['size'][1]} atlas, {size / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# dispatcher.py
+
+from game_logic.events import coalesce
+from game_logic.metrics import metrics
+
+BATCH_EVENT = "batch"
+
+
+def spectator_room(room):
+    """The Socket.IO room of the spectators of a table, they get its public frames only."""
+    return f"{room}/watch"
+
+
+class Dispatcher:
+    """
+    Delivers the events of one action: coalesces them and sends one batch to the
+    table room plus one batch per player that got private events.
+    A batch is a list of [event name, payload] pairs, the client replays them in order.
+
+    The public batch goes out as a single emit to the table room and its spectator
+    room together: Socket.IO encodes the packet once and writes the same bytes to
+    every seat and spectator, so a spectator costs one socket write per action.
+    """
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+
+    def frames(self, events, players):
+        public = []
+        private = {}    # sid -> frames
+        for event in coalesce(events):
+            for to, name, payload in event.frames(players):
+                metrics.inc("events_sent_total", event=name)
+                if to is None:
+                    public.append([name, payload])
+                else:
+                    private.setdefault(to.sid, []).append([name, payload])
+        return public, private
+
+    def flush(self, table, events=None):
+        if events is None:
+            events = table.game.take_events() if table.game else []
+        if not events:
+            return
+        public, private = self.frames(events, table.players)
+        if public:
+            self.socketio.emit(BATCH_EVENT, public, to=[table.room, spectator_room(table.room)])
+            metrics.inc("batches_sent_total", scope="table")
+        for sid, frames in private.items():
+            if sid:
+                self.socketio.emit(BATCH_EVENT, frames, room=sid)
+                metrics.inc("batches_sent_total", scope="player")
@@ -2,10 +2,7 @@ from game_logic.card import TichuCard
 
 
 def card_to_filename(card: TichuCard):
-    if card.suit:
-        return f"{card.suit}_{card.name}.png"
-    else:
-        return f"{card.name}.png"
+    return card.filename
 
 
 def flatten(xss):
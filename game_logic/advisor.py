@@ -0,0 +1,188 @@
+# game_logic/advisor.py
+#
+# Monte Carlo advisor for Tichu and Grand Tichu calls: estimates how likely a
+# hand (8 or 14 known cards) goes out first. Every sample deals the unknown
+# cards at random and plays the round out with GreedyBots on the headless
+# engine. Samples run in a process pool and stop, after a minimum number of
+# them, as soon as the estimate is precise enough or the time budget is used
+# up; results are cached per canonical hand (suits relabelled, they are symmetric).
+#
+#   python -m game_logic.advisor          estimates for a few hands and the time they take
+
+import collections
+import math
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from game_logic import cardmask
+from game_logic.bots import GreedyBot
+from game_logic.dealer import FIRST_DEAL, HAND_SIZE, NUM_CARDS, SEATS
+from game_logic.simulate import play_round
+
+SUIT_BITS = 13
+SUIT_FIELD = (1 << SUIT_BITS) - 1
+SPECIALS_SHIFT = 4 * SUIT_BITS
+
+
+class Advice:
+    __slots__ = ("probability", "samples", "cached")
+
+    def __init__(self, probability, samples, cached=False):
+        self.probability = probability     # estimated chance to go out first
+        self.samples = samples
+        self.cached = cached
+
+    def to_dict(self):
+        return {"probability": round(self.probability, 3), "samples": self.samples}
+
+    def __repr__(self):
+        return f"Advice({self.probability:.2f} from {self.samples} samples{', cached' if self.cached else ''})"
+
+
+def canonical(mask):
+    """Key of a hand that is equal for all hands that only differ by a relabelling of the suits."""
+    suits = sorted((mask >> (SUIT_BITS * s)) & SUIT_FIELD for s in range(4))
+    return mask >> SPECIALS_SHIFT, tuple(suits)
+
+
+def play_samples(known, samples, seed):
+    """Plays samples rounds with the known cards in seat 0 and returns how often seat 0 went out first."""
+    rng = random.Random(seed)
+    known = list(known)
+    unknown = [i for i in range(NUM_CARDS) if i not in set(known)]
+    bots = [GreedyBot(random.Random(rng.getrandbits(32))) for _ in range(SEATS)]
+    wins = 0
+    for _ in range(samples):
+        rng.shuffle(unknown)
+        own = known + unknown[:HAND_SIZE - len(known)]
+        others = unknown[HAND_SIZE - len(known):]
+        hands = [own] + [others[HAND_SIZE * i:HAND_SIZE * (i + 1)] for i in range(SEATS - 1)]
+        deal = [i for h in hands for i in h[:FIRST_DEAL]] + [i for h in hands for i in h[FIRST_DEAL:]]
+        points, order, actions = play_round(bots, deal=deal)
+        wins += order[0] == 0
+    return wins
+
+
+class TichuAdvisor:
+    """
+    processes=0 plays the samples in the calling process (no pool).
+    budget is the time in seconds one estimate may take, tolerance the half
+    width of the 95% interval that is good enough to stop early. Every estimate
+    plays at least min_samples rounds, even when that takes longer than the budget.
+
+    estimate() may run on several threads at once (tpool), the cache is guarded
+    by a lock. Under a monkey-patched eventlet pass an unpatched (OS thread) lock
+    factory. The pool is built here, once, and must be driven from the thread
+    that built it when its threading is green (see bot_seats.wait_for_pool()),
+    mp_context is passed on to it.
+    """
+
+    def __init__(self, processes=2, budget=0.08, tolerance=0.08, batch=2, min_samples=16, max_samples=400,
+                 cache_size=10000, lock_factory=threading.Lock, mp_context=None):
+        self.processes = processes
+        self.budget = budget
+        self.tolerance = tolerance
+        self.batch = batch
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()    # canonical hand -> Advice, least recently used first
+        self.pool = ProcessPoolExecutor(processes, mp_context=mp_context) if processes else None
+        self.rng = random.Random()
+        self.lock = lock_factory()
+
+    def warm_up(self):
+        """Starts the worker processes, so the first estimate does not pay for it."""
+        if self.processes:
+            for future in [self.pool.submit(play_samples, range(HAND_SIZE), 1, 0) for _ in range(self.processes)]:
+                future.result()
+
+    def estimate(self, cards):
+        mask = cardmask.to_mask(cards)
+        key = canonical(mask)
+        with self.lock:
+            advice = self.cache.get(key)
+            if advice is not None:
+                self.cache.move_to_end(key)
+                return Advice(advice.probability, advice.samples, cached=True)
+
+        known = list(cardmask.mask_indices(mask))
+        if self.processes:
+            wins, samples = self._run_pool(known)
+        else:
+            wins, samples = self._run_local(known)
+        advice = Advice(wins / samples if samples else 0.0, samples)
+        with self.lock:
+            self.cache[key] = advice
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return advice
+
+    def _precise_enough(self, wins, samples):
+        if samples >= self.max_samples:
+            return True
+        if samples < max(self.min_samples, 8):
+            return False
+        p = wins / samples
+        return 1.96 * math.sqrt(max(p * (1 - p), 0.01) / samples) < self.tolerance
+
+    def _run_local(self, known):
+        deadline = time.perf_counter() + self.budget
+        wins = samples = 0
+        while samples < self.min_samples or (time.perf_counter() < deadline
+                                             and not self._precise_enough(wins, samples)):
+            wins += play_samples(known, self.batch, self.rng.getrandbits(32))
+            samples += self.batch
+        return wins, samples
+
+    def _run_pool(self, known):
+        deadline = time.perf_counter() + self.budget
+        pool = self.pool
+        pending = {pool.submit(play_samples, known, self.batch, self.rng.getrandbits(32))
+                   for _ in range(self.processes * 2)}   # keep every worker busy
+        wins = samples = 0
+        while pending:
+            timeout = max(deadline - time.perf_counter(), 0) if samples >= self.min_samples else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                wins += future.result()
+                samples += self.batch
+            if self._precise_enough(wins, samples) or (samples >= self.min_samples
+                                                       and time.perf_counter() >= deadline):
+                break
+            for _ in done:
+                pending.add(pool.submit(play_samples, known, self.batch, self.rng.getrandbits(32)))
+        for future in pending:
+            future.cancel()
+        return wins, samples
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+
+if __name__ == "__main__":
+    from game_logic.card import DECK
+
+    strong = [DECK[i] for i in (52, 54, 55, 12, 25, 38, 51, 11, 24, 37, 50, 10, 23, 9)]    # MJ, Phoenix, Dragon, 4 A, 4 K, ...
+    weak = [DECK[i] for i in (0, 14, 28, 42, 3, 17, 5, 19, 33, 7, 21, 8, 53, 36)]           # low cards and the Dog
+
+    for processes in (0, 2):
+        advisor = TichuAdvisor(processes=processes)
+        advisor.warm_up()
+        for name, hand in (("strong 14", strong), ("weak 14", weak), ("strong 8", strong[:8]), ("weak 8", weak[:8])):
+            start = time.perf_counter()
+            advice = advisor.estimate(hand)
+            print(f"processes={processes} {name:>9}: {advice}  {1000 * (time.perf_counter() - start):.0f} ms")
+        start = time.perf_counter()
+        advice = advisor.estimate(strong)
+        print(f"processes={processes} strong 14 again: {advice}  {1000 * (time.perf_counter() - start):.2f} ms")
+        advisor.close()
+
+    advisor = TichuAdvisor(processes=2, budget=2, tolerance=0.02)
+    advisor.warm_up()
+    print("reference with 2 s budget:", advisor.estimate(strong), advisor.estimate(weak))
+    advisor.close()
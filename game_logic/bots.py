@@ -0,0 +1,133 @@
+# game_logic/bots.py
+#
+# Bot strategies. A strategy only decides, the game applies the decision
+# through the same TichuGame actions a human player uses.
+
+import random
+from game_logic import cardmask
+
+
+def combo_order(cards):
+    """Sort key from weakest to strongest play: bombs last, then by highest card."""
+    combo_type, rank, length = cardmask.classify(cards)
+    return "bomb" in combo_type, max(c.rank for c in cards), -length
+
+
+class RandomBot:
+    """Plays a random legal move, passes with the same chance as any move."""
+
+    name = "random"
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def choose_grand_tichu(self, game, player):
+        return False
+
+    def choose_pass_cards(self, game, player):
+        """Returns {target name: card} with one card for each other player."""
+        targets = [p for p in game.players if p is not player]
+        cards = self.rng.sample(player.hand, len(targets))
+        return {target.name: card for target, card in zip(targets, cards)}
+
+    def choose_play(self, game, player):
+        """Returns the cards to play or None to pass."""
+        options = list(game.legal_moves(player))
+        if game.current_trick:
+            options.append(None)
+        return self.rng.choice(options) if options else None
+
+    def choose_wish(self, game, player):
+        return "None"
+
+    def choose_dragon_recipient(self, game, player):
+        return self.rng.choice(game.dragon_possible_recipients)
+
+
+class GreedyBot(RandomBot):
+    """Always plays its weakest legal combo and keeps bombs unless it has to lead."""
+
+    name = "greedy"
+
+    def choose_pass_cards(self, game, player):
+        hand = sorted(player.hand, key=lambda c: c.rank)
+        partner = next(p for p in game.players if p.team == player.team and p is not player)
+        opponents = [p for p in game.players if p.team != player.team]
+        # best card to the partner, the two lowest to the opponents
+        assignments = {partner.name: hand[-1]}
+        for opponent, card in zip(opponents, hand):
+            assignments[opponent.name] = card
+        return assignments
+
+    def choose_play(self, game, player):
+        options = list(game.legal_moves(player))
+        if not options:
+            return None
+        best = min(options, key=combo_order)
+        if game.current_trick and combo_order(best)[0]:
+            return None     # nur noch Bomben übrig
+        return best
+
+
+class TunableBot(GreedyBot):
+    """GreedyBot that decides like RandomBot instead with probability 1 - strength."""
+
+    name = "tunable"
+
+    def __init__(self, rng=None, strength=1.0):
+        super().__init__(rng)
+        self.strength = strength
+
+    def _careful(self):
+        return self.rng.random() < self.strength
+
+    def choose_pass_cards(self, game, player):
+        strategy = GreedyBot if self._careful() else RandomBot
+        return strategy.choose_pass_cards(self, game, player)
+
+    def choose_play(self, game, player):
+        strategy = GreedyBot if self._careful() else RandomBot
+        return strategy.choose_play(self, game, player)
+
+
+BOTS = {bot.name: bot for bot in (RandomBot, GreedyBot, TunableBot)}
+
+# strength of the TunableBot behind a server-side bot seat
+LEVELS = {"easy": 0.2, "medium": 0.6, "hard": 1.0}
+
+
+def pending_decisions(game):
+    """The (decision, player) pairs the game is waiting for, see decide()."""
+    undecided = [p for p in game.players if p.called_grand_tichu is None]
+    if undecided:
+        return [("grand_tichu_choice", p) for p in undecided]
+    passing = [p for p in game.players if not p.passed_cards]
+    if passing:
+        return [("pass_cards", p) for p in passing]
+    if game.is_round_over():
+        return []
+    if game.waiting_for_dragon_choice:
+        return [("dragon_recipient_selected", game.dragon_winner)]
+    if game.waiting_for_wish:
+        return [("wish", game.wish_player())]
+    return [("play_card", game.get_current_player())]
+
+
+def decide(game, player, decision, bot):
+    """
+    The bot's answer to a pending decision as the (event, data) a client would
+    send for it, so bot seats act through the same handlers as humans.
+    """
+    if decision == "grand_tichu_choice":
+        return decision, {"choice": bot.choose_grand_tichu(game, player)}
+    if decision == "pass_cards":
+        assignments = bot.choose_pass_cards(game, player)
+        return decision, {"assignments": {name: card.id for name, card in assignments.items()}}
+    if decision == "dragon_recipient_selected":
+        return decision, {"recipient": bot.choose_dragon_recipient(game, player)}
+    if decision == "wish":
+        return decision, {"wish": bot.choose_wish(game, player)}
+    cards = bot.choose_play(game, player)
+    if cards is None:
+        return "pass", {}
+    return decision, {"cards": [card.id for card in cards]}
@@ -1,15 +1,37 @@
 # game_logic/card.py
 
 class TichuCard:
-    def __init__(self, name, suit=None, rank=None, points=0):
-        self.name = name  # "2", "A", "Dragon", etc.
-        self.suit = suit  # "black", "green", "blue", "red", or None
-        self.rank = rank  # 2-14 for standard, custom for specials
-        self.points = points  # Used for scoring
-        if self.suit:
-            self.id = self.name + "_" + self.suit
-        else:
-            self.id = self.name
+    """
+    One of the 56 cards. They are created once at import (see DECK) and shared by
+    every game, so cards are immutable and compared by identity.
+    """
+    __slots__ = ("name", "suit", "rank", "points", "id", "index", "filename")
+
+    def __init__(self, name, suit=None, rank=None, points=0, index=None):
+        set_ = object.__setattr__
+        set_(self, "name", name)  # "2", "A", "Dragon", etc.
+        set_(self, "suit", suit)  # "black", "green", "blue", "red", or None
+        set_(self, "rank", rank)  # 2-14 for standard, custom for specials
+        set_(self, "points", points)  # Used for scoring
+        set_(self, "id", name + "_" + suit if suit else name)
+        set_(self, "index", index)    # position in DECK, the integer id of the card
+        set_(self, "filename", f"{suit}_{name}.png" if suit else f"{name.lower().replace(' ', '')}.png")  # static/cards
+
+    def __setattr__(self, key, value):
+        raise AttributeError("TichuCard is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("TichuCard is immutable")
+
+    def __reduce__(self):
+        # pickling (multiprocessing) hands back the shared card of the other process
+        return card_from_index, (self.index,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __repr__(self):
         return f"{self.name} of {self.suit}" if self.suit else self.name
@@ -18,26 +40,56 @@ class TichuCard:
         return self.rank < other.rank
 
 
-def create_tichu_deck():
+RANK_NAMES = ("2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A")
+
+
+def _build_deck():
     suits = ["spades", "diamonds", "hearts", "clubs"]  # TODO: should be "black", "green", "blue", "red", or None
-    names = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A"]
+    names = RANK_NAMES
     rank_map = {name: i+2 for i, name in enumerate(names)}
     point_map = {"5": 5, "10": 10, "K": 10}
 
-    deck = []
+    specs = []
 
     # Standard cards
     for suit in suits:
         for name in names:
-            deck.append(TichuCard(name=name, suit=suit, rank=rank_map[name], points=point_map.get(name, 0)))
+            specs.append((name, suit, rank_map[name], point_map.get(name, 0)))
 
     # Special cards
-    deck.append(TichuCard("Mah Jong", rank=1, points=0))
-    deck.append(TichuCard("Dog", rank=-1, points=0))
-    deck.append(TichuCard("Phoenix", rank=0, points=-25))   # special handling
-    deck.append(TichuCard("Dragon", rank=15, points=25))   # highest
+    specs.append(("Mah Jong", None, 1, 0))
+    specs.append(("Dog", None, -1, 0))
+    specs.append(("Phoenix", None, 0, -25))   # special handling
+    specs.append(("Dragon", None, 15, 25))    # highest
+
+    return tuple(TichuCard(name, suit, rank, points, index=i) for i, (name, suit, rank, points) in enumerate(specs))
 
-    return deck
+
+DECK = _build_deck()
+
+
+# every way a client may name a card: integer id, string id ("K_spades") and filename ("spades_K.png")
+CARD_BY_KEY = {}
+for _card in DECK:
+    CARD_BY_KEY[_card.index] = _card
+    CARD_BY_KEY[_card.id] = _card
+    CARD_BY_KEY[_card.filename] = _card
+
+
+def card_from_index(index):
+    return DECK[index]
+
+
+def card_from_key(key):
+    try:
+        return CARD_BY_KEY[key]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown card: {key}") from None
+
+
+def create_tichu_deck():
+    """A fresh, unshuffled list of the shared cards."""
+    return list(DECK)
 
 
 # Test run
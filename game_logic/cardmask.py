@@ -0,0 +1,283 @@
+# game_logic/cardmask.py
+#
+# Compact card encoding: every card of the 56 card deck has a fixed index,
+# a set of cards is a bitmask (fits in 64 bits) and the rank multiset of a
+# set of cards is a packed count vector (3 bits per rank slot).
+# The combo classifier works on the count vector only, so its results are
+# memoized in a lookup table and reused by every Combo of every table.
+
+from game_logic.card import DECK
+
+# rank slots: Dog (-1) -> 0, Phoenix (0) -> 1, Mah Jong (1) -> 2, 2..A -> 3..15, Dragon (15) -> 16
+SLOT_BITS = 3
+SLOT_OFFSET = 1
+NUM_SLOTS = 17
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+PHOENIX_RANK = 0
+DOG_RANK = -1
+
+DECK_ORDER = DECK
+NUM_CARDS = len(DECK_ORDER)
+FULL_MASK = (1 << NUM_CARDS) - 1
+
+CARD_INDEX = {(c.name, c.suit): i for i, c in enumerate(DECK_ORDER)}
+CARD_BIT = tuple(1 << i for i in range(NUM_CARDS))
+CARD_RANK = tuple(c.rank for c in DECK_ORDER)
+CARD_POINTS = tuple(c.points for c in DECK_ORDER)
+CARD_UNIT = tuple(1 << (SLOT_BITS * (c.rank + SLOT_OFFSET)) for c in DECK_ORDER)
+
+SUIT_MASK = {}
+for _i, _c in enumerate(DECK_ORDER):
+    SUIT_MASK[_c.suit] = SUIT_MASK.get(_c.suit, 0) | CARD_BIT[_i]
+CARD_SUIT_MASK = tuple(SUIT_MASK[c.suit] if c.suit else 0 for c in DECK_ORDER)
+
+PHOENIX_BIT = CARD_BIT[CARD_INDEX[("Phoenix", None)]]
+DRAGON_BIT = CARD_BIT[CARD_INDEX[("Dragon", None)]]
+DOG_BIT = CARD_BIT[CARD_INDEX[("Dog", None)]]
+MAHJONG_BIT = CARD_BIT[CARD_INDEX[("Mah Jong", None)]]
+
+
+def card_index(card):
+    return card.index
+
+
+def card_indices(cards):
+    return [card.index for card in cards]
+
+
+def cards_from_indices(indices):
+    return [DECK_ORDER[i] for i in indices]
+
+
+def to_mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= CARD_BIT[card.index]
+    return mask
+
+
+def mask_indices(mask):
+    """Yields the card indices of a mask in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def mask_points(mask):
+    return sum(CARD_POINTS[i] for i in mask_indices(mask))
+
+
+def counts_key(cards):
+    key = 0
+    for card in cards:
+        key += CARD_UNIT[card.index]
+    return key
+
+
+def mask_counts_key(mask):
+    key = 0
+    for i in mask_indices(mask):
+        key += CARD_UNIT[i]
+    return key
+
+
+def rank_counts(key):
+    """Unpacks a count vector into {rank: count}."""
+    counts = {}
+    for slot in range(NUM_SLOTS):
+        count = (key >> (SLOT_BITS * slot)) & SLOT_MASK
+        if count:
+            counts[slot - SLOT_OFFSET] = count
+    return counts
+
+
+# === Reference rules on a sorted list of ranks ===
+
+def _consecutive(values):
+    return all(values[i + 1] == values[i] + 1 for i in range(len(values) - 1))
+
+
+def straight_top(ranks):
+    """
+    Returns the top rank of the straight formed by ranks, or None.
+    With the Phoenix the gap may be filled or the straight extended by one on top.
+    """
+    phoenix = PHOENIX_RANK in ranks
+    values = sorted(set(ranks))
+    if len(values) != len(ranks):
+        return None
+    if not phoenix:
+        return values[-1] if _consecutive(values) else None
+
+    values = values[1:]     # drop phoenix from values (bc has value 0)
+    for i in range(min(values), max(values) + 2):
+        trial = sorted(values + [i])
+        if _consecutive(trial):
+            if i == max(values) + 1:
+                return max(ranks) + 1
+            return max(ranks)
+    return None
+
+
+def is_pair_sequence(ranks):
+    phoenix_count = ranks.count(PHOENIX_RANK)
+    sorted_ranks = sorted(r for r in ranks if r != PHOENIX_RANK)
+
+    pair_ranks = []
+    i = 0
+    while i < len(sorted_ranks):
+        if i + 1 < len(sorted_ranks) and sorted_ranks[i] == sorted_ranks[i + 1]:
+            pair_ranks.append(sorted_ranks[i])
+            i += 2
+        elif phoenix_count > 0:
+            # missing partner -> the Phoenix completes the pair
+            pair_ranks.append(sorted_ranks[i])
+            phoenix_count -= 1
+            i += 1
+        else:
+            return False
+
+    while phoenix_count > 0:
+        pair_ranks.append(pair_ranks[-1] + 1 if pair_ranks else 1)
+        phoenix_count -= 1
+
+    return _consecutive(pair_ranks)
+
+
+def _classify_ranks(ranks):
+    """
+    Classifies a rank multiset. Returns (type, rank, length, bomb_type):
+    bomb_type is "bomb_straight" for straights (used when all cards share a suit).
+    rank is None for a Phoenix single, it depends on the trick.
+    """
+    n = len(ranks)
+    counts = {}
+    for r in ranks:
+        counts[r] = counts.get(r, 0) + 1
+    unique_counts = sorted(counts.values())
+    phoenix = PHOENIX_RANK in counts
+    natural_ranks = [r for r in ranks if r != PHOENIX_RANK]
+
+    if n == 1:
+        if ranks[0] == DOG_RANK:
+            return "dog", -1, n, None
+        return "single", (None if phoenix else ranks[0]), n, None
+
+    if n == 2 and (unique_counts == [2] or (phoenix and len(counts) == 2)):
+        return "pair", natural_ranks[0], n, None
+
+    if n == 3 and (unique_counts == [3] or (phoenix and len(counts) == 2)):
+        return "triple", natural_ranks[0], n, None
+
+    if n == 5:
+        if unique_counts == [2, 3] or (phoenix and unique_counts in ([1, 2, 2], [1, 1, 3])):
+            triples = [r for r, c in counts.items() if c == 3]
+            if triples:
+                return "full_house", triples[0], n, None
+            return "full_house", max(r for r, c in counts.items() if c == 2), n, None
+
+    if n == 4 and unique_counts == [4]:
+        return "bomb_4kind", ranks[0], n, None
+
+    if n >= 5:
+        top = straight_top(ranks)
+        if top is not None:
+            return "straight", 100 * n + top, n, "bomb_straight"
+
+    if n >= 4 and n % 2 == 0 and is_pair_sequence(ranks):
+        return "pair_sequence", 200 * n + max(ranks), n, None
+
+    return "invalid", -1, n, None
+
+
+INVALID = ("invalid", -1, 0)
+
+_COMBO_TABLE = {}   # count vector -> (type, rank, length)
+_BOMB_TABLE = {}    # count vector -> (type, rank, length) if all cards share a suit
+
+
+def _lookup(key):
+    entry = _COMBO_TABLE.get(key)
+    if entry is None:
+        counts = rank_counts(key)
+        ranks = sorted(r for r, c in counts.items() for _ in range(c))
+        if not ranks:
+            return INVALID
+        combo_type, rank, length, bomb_type = _classify_ranks(ranks)
+        entry = (combo_type, rank, length)
+        _COMBO_TABLE[key] = entry
+        if bomb_type:
+            _BOMB_TABLE[key] = (bomb_type, rank, length)
+    return entry
+
+
+def classify_mask(mask, key=None):
+    """Returns (type, rank, length) of the cards in mask."""
+    if key is None:
+        key = mask_counts_key(mask)
+    entry = _lookup(key)
+    if entry[0] == "straight":
+        low = mask & -mask
+        suit_mask = CARD_SUIT_MASK[low.bit_length() - 1]
+        if suit_mask and mask & suit_mask == mask:
+            return _BOMB_TABLE[key]
+    return entry
+
+
+def mask_and_key(cards):
+    mask = 0
+    key = 0
+    for card in cards:
+        i = card.index
+        mask |= CARD_BIT[i]
+        key += CARD_UNIT[i]
+    return mask, key
+
+
+def classify(cards):
+    """Returns (type, rank, length) of a list of TichuCards."""
+    return classify_mask(*mask_and_key(cards))
+
+
+def precompute():
+    """Fills the table for every straight, pair sequence, full house and set of a kind."""
+    naturals = list(range(2, 15))
+    specials = [DOG_RANK, PHOENIX_RANK, 1, 15]
+    for r in naturals + specials:
+        _lookup(_key([r]))
+        if r != PHOENIX_RANK:
+            _lookup(_key([r, PHOENIX_RANK]))
+    for r in naturals:
+        for n in (2, 3, 4):
+            _lookup(_key([r] * n))
+        _lookup(_key([r, r, PHOENIX_RANK]))
+        for s in naturals + specials:
+            if s not in (r, PHOENIX_RANK):
+                _lookup(_key([r] * 3 + [s] * 2))
+                _lookup(_key([r] * 3 + [s, PHOENIX_RANK]))
+                _lookup(_key([r] * 2 + [s] * 2 + [PHOENIX_RANK]))
+    line = list(range(1, 16))
+    for lo in range(len(line)):
+        for hi in range(lo + 1, len(line)):
+            run = line[lo:hi + 1]
+            if len(run) >= 4:
+                _lookup(_key(run))
+                _lookup(_key(run + [PHOENIX_RANK]))
+                for gap in run[1:-1]:
+                    _lookup(_key([r for r in run if r != gap] + [PHOENIX_RANK]))
+            if len(run) <= 7:
+                _lookup(_key([r for r in run for _ in range(2)]))
+                for single in run:
+                    _lookup(_key([r for r in run for _ in range(1 if r == single else 2)] + [PHOENIX_RANK]))
+
+
+def _key(ranks):
+    key = 0
+    for r in ranks:
+        key += 1 << (SLOT_BITS * (r + SLOT_OFFSET))
+    return key
+
+
+precompute()
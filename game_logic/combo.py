@@ -1,167 +1,38 @@
+import logging
+from game_logic import cardmask
+
+log = logging.getLogger(__name__)
+
 class Combo:
     def __init__(self, cards, gamemanager):
         self.cards = cards
-        self.phoenix = any(card.name.lower() == "phoenix" for card in cards)
-        self.contains_dragon = any(card.name.lower() == "dragon" for card in cards)
-        self.phoenix_straight_max = False
+        self.mask = cardmask.to_mask(cards)
+        self.phoenix = bool(self.mask & cardmask.PHOENIX_BIT)
+        self.contains_dragon = bool(self.mask & cardmask.DRAGON_BIT)
         self.gamemanager = gamemanager
-        self.type = self.identify_combo_type()
+        # type, rank and length come from the precomputed classifier table
+        self.type, self._base_rank, self.length = cardmask.classify_mask(self.mask)
         self.rank = self.get_rank()  # Used for comparisons
 
     def identify_combo_type(self):
-        cards = self.cards
-        counts = {}
-
-        for card in cards:
-            value = card.name
-            counts[value] = counts.get(value, 0) + 1
-
-        unique_counts = list(counts.values())
-
-        # === SINGLE and DOG===
-        if len(cards) == 1:
-            if cards[0].name.lower() == "dog":
-                return "dog"
-            return "single"
-
-        # === PAIR ===
-        if len(cards) == 2:
-            if unique_counts == [2]:
-                return "pair"
-            if self.phoenix and len(counts) == 2:
-                return "pair"
-
-        # === TRIPLE ===
-        if len(cards) == 3:
-            if unique_counts == [3]:
-                return "triple"
-            if self.phoenix and len(counts) == 2:
-                return "triple"
-
-        # === FULL HOUSE ===
-        if len(cards) == 5:
-            if sorted(unique_counts) == [2, 3]:
-                return "full_house"
-            if self.phoenix and (sorted(unique_counts) == [1, 2, 2] or sorted(unique_counts) == [1, 1, 3]):
-                return "full_house"
-
-        # === FOUR-OF-A-KIND BOMB ===
-        if len(cards) == 4 and unique_counts == [4]:
-            return "bomb_4kind"
-
-        # === STRAIGHT and STRAIGHT BOMB ===
-        if len(cards) >= 5 and self.is_straight(cards):
-            same_suit = all(card.suit == cards[0].suit for card in cards)
-            if same_suit:
-                return "bomb_straight"
-            else:
-                return "straight"
-
-        # === PAIR SEQUENCE (Treppenpärchen) ===
-        if len(cards) >= 4 and len(cards) % 2 == 0:
-            if self.is_pair_sequence(cards):
-                return "pair_sequence"
-
-        return "invalid"
+        return self.type
 
     def is_straight(self, cards):
-        try:
-            values = [card.rank for card in cards]
-        except ValueError:
-            print("ValueError!")
-            return False
-
-        values = sorted(set(values))
-        needed_length = len(cards)
-
-        if len(values) == len(cards) and self.phoenix is False:
-            # No Phoenix: standard straight
-            return all(values[i+1] == values[i] + 1 for i in range(len(values)-1))
-
-        if self.phoenix and len(values) == needed_length:
-            # Phoenix: try all possible places to insert a wildcard to create a straight
-            values = values[1:]     # drop phoenix from values (bc has value 0)
-            for i in range(min(values), max(values) + 2):
-                trial = sorted(values + [i])
-                if all(trial[j + 1] == trial[j] + 1 for j in range(len(trial) - 1)):
-                    if i == max(values) + 1:
-                        self.phoenix_straight_max = True
-                    return True
-
-        return False
+        return cardmask.straight_top([card.rank for card in cards]) is not None
 
     def is_pair_sequence(self, cards):
-        phoenix_count = sum(1 for c in cards if c.name.lower() == "phoenix")
-        non_phoenix_cards = [c for c in cards if c.name.lower() != "phoenix"]
-
-        # Sortiere Nicht-Phoenix-Karten nach Rank
-        sorted_cards = sorted(non_phoenix_cards, key=lambda c: c.rank)
-
-        # Prüfen, ob jede zweite Karte ein Pärchen ist (ohne Phoenix)
-        pair_ranks = []
-        used_phoenix = 0
-        i = 0
-        while i < len(sorted_cards):
-            if i + 1 < len(sorted_cards) and sorted_cards[i].rank == sorted_cards[i + 1].rank:
-                # Normales Paar gefunden
-                pair_ranks.append(sorted_cards[i].rank)
-                i += 2
-            else:
-                # Fehlendes Paar -> Phoenix einsetzen, falls verfügbar
-                if phoenix_count > 0:
-                    pair_ranks.append(sorted_cards[i].rank)
-                    phoenix_count -= 1
-                    i += 1
-                else:
-                    return False
-
-        # Falls nach der Pärchenbildung noch Phoenix übrig sind, setze sie ans Ende
-        while phoenix_count > 0:
-            if pair_ranks:
-                pair_ranks.append(pair_ranks[-1] + 1)  # Nächsthöheres Paar
-            else:
-                pair_ranks.append(1)  # Falls nur Phoenix, starte bei klein
-            phoenix_count -= 1
-
-        # Prüfen, ob die Paare aufeinanderfolgen
-        return all(pair_ranks[i + 1] == pair_ranks[i] + 1 for i in range(len(pair_ranks) - 1))
+        return cardmask.is_pair_sequence([card.rank for card in cards])
 
     def get_rank(self):
-        if self.type == "single":
-            if self.phoenix:
-                if self.gamemanager.current_trick:
-                    prev_rank = self.gamemanager.current_trick[-1]["combo"].rank
-                    rank = min(prev_rank + 0.5, 14.5)
-                    print(prev_rank, rank)
-                    return rank
-                else:
-                    return 1.5
-            return self.cards[0].rank
-        if self.type in ["pair", "triple"]:
-            if self.cards[0].name.lower() != "phoenix":
-                return self.cards[0].rank
+        if self.type == "single" and self.phoenix:
+            if self.gamemanager.current_trick:
+                prev_rank = self.gamemanager.current_trick[-1]["combo"].rank
+                rank = min(prev_rank + 0.5, 14.5)
+                log.debug("phoenix single prev_rank=%s rank=%s", prev_rank, rank)
+                return rank
             else:
-                return self.cards[1].rank
-        elif self.type == "bomb_4kind":
-            return self.cards[0].rank
-        elif self.type == "full_house":
-            counts = {}
-            for c in self.cards:
-                counts[c.rank] = counts.get(c.rank, 0) + 1
-            temp_max_val = 0
-            for rank, count in counts.items():
-                if count == 3:
-                    return rank
-                if self.phoenix and count == 2:
-                    temp_max_val = max(temp_max_val, rank)
-            return temp_max_val
-        elif self.type == "straight" or self.type == "bomb_straight":
-            if self.phoenix_straight_max:
-                return 100 * len(self.cards) + max(c.rank for c in self.cards) + 1
-            return 100 * len(self.cards) + max(c.rank for c in self.cards)
-        elif self.type == "pair_sequence":
-            return 200 * len(self.cards) + max(c.rank for c in self.cards)
-        return -1  # Invalid combos
+                return 1.5
+        return self._base_rank
 
     def __repr__(self):
         if self.type in ["single", "pair", "triple", "bomb_4kind", "full_house"]:
@@ -173,3 +44,16 @@ class Combo:
         else:
             out = self.type
         return out
+
+
+def beats(combo_type, rank, length, top_type, top_rank, top_length):
+    """True if a combo can be played on top of the combo currently on the table."""
+    if top_type == combo_type:
+        if combo_type in ["pair_sequence", "straight"] and top_length != length:
+            return False
+        return rank > top_rank
+    # 4er bomb wins except vs straight bomb, 4er vs 4er is handled above
+    if combo_type == "bomb_4kind":
+        return "bomb" not in top_type
+    # straight bomb wins bc straight bomb vs straight bomb is handled above
+    return combo_type == "bomb_straight"
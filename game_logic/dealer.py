@@ -0,0 +1,152 @@
+# game_logic/dealer.py
+#
+# Deals as permutations of the 56 card indices (see card.DECK). A deal is dealt
+# in slices: the first 32 entries are the four first-eight hands (seat 0 gets
+# deal[0:8], seat 1 deal[8:16], ...), the last 24 the four remaining sixes.
+#
+# shuffled(seed) is the deal of one logged round seed. deal_batch() produces many
+# deals at once, as a NumPy array (deals x 56) when numpy is installed, for
+# simulations and for tournament pre-dealing (duplicate Tichu: the same deal
+# at several tables).
+#
+#   python -m game_logic.dealer        benchmark against the old per-card dealing
+
+import random
+from game_logic.card import DECK
+
+try:
+    import numpy as np
+except ImportError:     # optional, deal_batch() falls back to random.Random
+    np = None
+
+NUM_CARDS = len(DECK)
+FIRST_DEAL = 8
+HAND_SIZE = 14
+SEATS = 4
+
+
+def shuffled(seed):
+    """The deal (list of 56 card indices) of a round seed."""
+    deal = list(range(NUM_CARDS))
+    random.Random(seed).shuffle(deal)
+    return deal
+
+
+def first_eight(deal, seat):
+    return deal[FIRST_DEAL * seat:FIRST_DEAL * (seat + 1)]
+
+
+def remaining_six(deal, seat):
+    rest = HAND_SIZE - FIRST_DEAL
+    start = FIRST_DEAL * SEATS + rest * seat
+    return deal[start:start + rest]
+
+
+def deal_batch(n, seed=None, use_numpy=True):
+    """n deals, one row of 56 card indices each (uint8 array with numpy, list of lists without)."""
+    if np is not None and use_numpy:
+        rng = np.random.default_rng(seed)
+        return rng.permuted(np.tile(np.arange(NUM_CARDS, dtype=np.uint8), (n, 1)), axis=1)
+    rng = random.Random(seed)
+    order = range(NUM_CARDS)
+    return [rng.sample(order, NUM_CARDS) for _ in range(n)]
+
+
+def deals(n, seed=None):
+    """deal_batch() as plain lists of ints, ready for TichuGame.start_new_round(deal=...)."""
+    batch = deal_batch(n, seed)
+    return batch.tolist() if np is not None else batch
+
+
+class Dealer:
+    """
+    Per-table source of deals. Every round gets its own 64 bit seed from the
+    table's RNG, so a table is reproducible from its first seed and tables do
+    not share random state.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.prepared = None    # (seed, deal) of the next round, see prepare()
+
+    def next_seed(self):
+        return self.rng.getrandbits(64)
+
+    def prepare(self):
+        """Shuffles the next deal ahead of time, the seeds come in the same order either way."""
+        if self.prepared is None:
+            seed = self.next_seed()
+            self.prepared = (seed, shuffled(seed))
+
+    def next_deal(self):
+        """(seed, deal) of the next round, the prepared one if there is one."""
+        self.prepare()
+        deal, self.prepared = self.prepared, None
+        return deal
+
+
+def _old_deal(players, seed):
+    """The dealing loop before the bulk dealer: shuffle TichuCards, pop them one by one."""
+    deck = list(DECK)
+    random.Random(seed).shuffle(deck)
+    for _ in range(FIRST_DEAL):
+        for p in players:
+            p.receive_card(deck.pop())
+    for _ in range(HAND_SIZE - FIRST_DEAL):
+        for p in players:
+            p.receive_card(deck.pop())
+
+
+def _new_deal(players, deal):
+    for seat, p in enumerate(players):
+        p.receive_cards([DECK[i] for i in first_eight(deal, seat)])
+    for seat, p in enumerate(players):
+        p.receive_cards([DECK[i] for i in remaining_six(deal, seat)])
+
+
+if __name__ == "__main__":
+    import time
+    from game_logic.player import TichuPlayer
+
+    count = 20000
+    players = [TichuPlayer(f"P{i}") for i in range(SEATS)]
+
+    def bench(name, fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>32}: {count / elapsed:>10.0f} deals/sec")
+
+    def old_loop():
+        for n in range(count):
+            for p in players:
+                p.reset_for_new_round()
+            _old_deal(players, n)
+
+    def per_round():
+        for n in range(count):
+            for p in players:
+                p.reset_for_new_round()
+            _new_deal(players, shuffled(n))
+
+    def batch(use_numpy):
+        def run():
+            batch = deal_batch(count, seed=0, use_numpy=use_numpy)
+            for row in (batch.tolist() if use_numpy else batch):
+                for p in players:
+                    p.reset_for_new_round()
+                _new_deal(players, row)
+        return run
+
+    def generate_only(use_numpy):
+        return lambda: deal_batch(count, seed=0, use_numpy=use_numpy)
+
+    bench("per-card pop() loop (old)", old_loop)
+    bench("seeded shuffle + slices", per_round)
+    bench("deal_batch (pure Python) + hands", batch(False))
+    bench("deal_batch only (pure Python)", generate_only(False))
+    if np is not None:
+        bench("deal_batch (NumPy) + hands", batch(True))
+        bench("deal_batch only (NumPy)", generate_only(True))
+    else:
+        print("numpy is not installed, skipping the vectorized dealer")
@@ -0,0 +1,195 @@
+# game_logic/events.py
+#
+# Events produced by TichuGame actions. The engine only records them in its
+# outbox, the server decides how they reach the clients (see dispatcher.py).
+# to=None addresses the whole table, otherwise the event is private to one player.
+# Cards go over the wire as their integer id (card.index), the client draws them
+# from the card atlas (see build_assets.py).
+
+
+class Event:
+    name = None         # client side event name
+    coalesce = False    # only the latest event of this kind (per recipient) is delivered
+    __slots__ = ("to",)
+
+    def __init__(self, to=None):
+        self.to = to
+
+    def payload(self):
+        return None
+
+    def frames(self, players):
+        """Yields (recipient or None for the table, event name, payload)."""
+        yield self.to, self.name, self.payload()
+
+    def coalesce_key(self):
+        return type(self), self.to
+
+    def __repr__(self):
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for cls in type(self).__mro__
+                           for slot in getattr(cls, "__slots__", ()))
+        return f"{type(self).__name__}({fields})"
+
+
+class GameMessage(Event):
+    name = "game_message"
+    __slots__ = ("message",)
+
+    def __init__(self, message, to=None):
+        super().__init__(to)
+        self.message = message
+
+    def payload(self):
+        return {"message": self.message}
+
+
+class TurnMessage(GameMessage):
+    name = "turn_message"
+    __slots__ = ()
+
+
+class HandUpdated(Event):
+    """The hand is read when the event is delivered, so several updates collapse into one."""
+    name = "update_hand"
+    coalesce = True
+    __slots__ = ()
+
+    def __init__(self, player):
+        super().__init__(player)
+
+    def payload(self):
+        return {"hand": [card.index for card in self.to.hand], "version": self.to.hand_version}
+
+
+class HandDelta(Event):
+    """Cards that left or entered one hand, the client applies it on top of version base."""
+    name = "hand_delta"
+    __slots__ = ("base", "version", "removed", "added")
+
+    def __init__(self, player, base, removed=(), added=()):
+        super().__init__(player)
+        self.base = base
+        self.version = player.hand_version
+        self.removed = list(removed)
+        self.added = list(added)
+
+    def payload(self):
+        return {
+            "base": self.base,
+            "version": self.version,
+            "removed": [c.index for c in self.removed],
+            "added": [c.index for c in self.added],
+        }
+
+
+class TurnChanged(Event):
+    """Sent once to the whole table, every client compares "current" with its own name."""
+    name = "turn_update"
+    coalesce = True
+    __slots__ = ("current",)
+
+    def __init__(self, current):
+        super().__init__()
+        self.current = current
+
+    def payload(self):
+        return {"current": self.current.name}
+
+
+class CardsPlayed(Event):
+    name = "last_played"
+    __slots__ = ("player", "cards")
+
+    def __init__(self, player, cards):
+        super().__init__()
+        self.player = player
+        self.cards = cards
+
+    def payload(self):
+        return {"cards": [c.index for c in self.cards], "player": self.player.name}
+
+
+class TrickWon(GameMessage):
+    __slots__ = ("winner", "combo")
+
+    def __init__(self, winner, combo):
+        super().__init__(f"{winner.name} wins the trick with {combo}.")
+        self.winner = winner
+        self.combo = combo
+
+
+class RoundOver(Event):
+    name = "round_over"
+    __slots__ = ("scores", "round_points", "result")
+
+    def __init__(self, scores, round_points, result=None):
+        super().__init__()
+        self.scores = dict(scores)
+        self.round_points = round_points
+        self.result = result    # TichuGame.round_result(), for the results store, not sent
+
+    def payload(self):
+        return {"scores": self.scores, "round_points": self.round_points}
+
+
+class MatchOver(Event):
+    name = "match_over"
+    __slots__ = ("winner", "scores")
+
+    def __init__(self, winner, scores):
+        super().__init__()
+        self.winner = winner
+        self.scores = dict(scores)
+
+    def payload(self):
+        return {"winner": self.winner, "scores": self.scores}
+
+
+class GrandTichuRequested(Event):
+    name = "call_grand_tichu"
+    __slots__ = ()
+
+
+class PassingStarted(Event):
+    name = "start_passing"
+    __slots__ = ("cards", "targets")
+
+    def __init__(self, player, targets):
+        super().__init__(player)
+        self.cards = [card.index for card in player.hand]
+        self.targets = targets
+
+    def payload(self):
+        return {"cards": self.cards, "targets": self.targets}
+
+
+class PassingComplete(Event):
+    name = "passing_complete"
+    __slots__ = ()
+
+
+class WishRequested(Event):
+    name = "ask_wish"
+    __slots__ = ()
+
+
+class DragonChoiceRequested(Event):
+    name = "choose_dragon_recipient"
+    __slots__ = ("recipients",)
+
+    def __init__(self, winner, recipients):
+        super().__init__(winner)
+        self.recipients = recipients
+
+    def payload(self):
+        return {"recipients": self.recipients}
+
+
+def coalesce(events):
+    """Drops every coalescing event that is superseded by a later one of the same kind."""
+    latest = {}
+    for i, event in enumerate(events):
+        if event.coalesce:
+            latest[event.coalesce_key()] = i
+    return [event for i, event in enumerate(events)
+            if not event.coalesce or latest[event.coalesce_key()] == i]
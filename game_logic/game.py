@@ -1,21 +1,31 @@
 # game_logic/tichu_game.py
 
+import logging
 import random
-from game_logic.card import create_tichu_deck, TichuCard
+from game_logic.card import create_tichu_deck, DECK, RANK_NAMES
 from game_logic.player import TichuPlayer
-from game_logic.combo import Combo
-from game_logic.Helpers import card_to_filename, flatten
+from game_logic.combo import Combo, beats
+from game_logic import cardmask, dealer, moves, snapshot
+from game_logic.metrics import metrics
+from game_logic.events import (GameMessage, TurnMessage, HandUpdated, HandDelta, TurnChanged, CardsPlayed, TrickWon, RoundOver,
+                               GrandTichuRequested, PassingStarted, PassingComplete, WishRequested,
+                               DragonChoiceRequested, MatchOver)
+
+log = logging.getLogger(__name__)
 
 
 class TichuGame:
-    def __init__(self, players, socketio):
+    TARGET_SCORE = 1000
+
+    def __init__(self, players, room=None, seed=None, target_score=TARGET_SCORE):
         assert len(players) == 4, "Tichu requires exactly 4 players."
         self.players = players
+        self.players_by_name = {p.name: p for p in players}
         self.assign_teams()
         self.deck = []
         self.pile = []  # center pile of played cards
         self.turn_index = 0
-        self.round_number = 1
+        self.round_number = 0   # counted up by start_new_round()
         self.finished_players = []
         self.current_trick = []     # ist ein dict mit [{"combo": Combo, "player": Player}]
         self.waiting_for_wish = False
@@ -25,56 +35,95 @@ class TichuGame:
         self.dragon_possible_recipients = None
         self.team_scores = {"A": 0, "B": 0}
         self.pass_count = 0
-        self.socketio = socketio
+        self.room = room    # Socket.IO room of the table
+        self.outbox = []    # events of the current action, see take_events()
+        self.journal = None     # GameLog of the accepted actions, see gamelog.py
+        self.dealer = dealer.Dealer(seed)   # per table, a seed makes all deals of the table reproducible
+        self.round_seed = None
+        self.target_score = target_score    # the match ends once a team has this many points and leads
+        self.winner = None      # team that won the match
 
     def assign_teams(self):
         # Assign teams A and B alternately
         for i, player in enumerate(self.players):
             player.team = 'A' if i % 2 == 0 else 'B'
 
+    def attach_journal(self, journal):
+        self.journal = journal
+        self.record("table", self.room, [p.name for p in self.players], self.target_score)
+
+    def record(self, *entry):
+        if self.journal is not None:
+            self.journal.append(list(entry))
+
+    def notify(self, event):
+        self.outbox.append(event)
+
+    def take_events(self):
+        """Returns and clears the events recorded since the last call."""
+        events, self.outbox = self.outbox, []
+        return events
+
+    def message(self, message, to=None):
+        self.notify(GameMessage(message, to))
+
     def send_hands_to_players(self):
         for p in self.players:
-            hand_images = [card_to_filename(card) for card in p.hand]
-            self.socketio.emit('update_hand', {'hand': hand_images}, room=p.sid)
+            self.notify(HandUpdated(p))
+
+    def send_turn_update(self):
+        self.notify(TurnChanged(self.get_current_player()))
 
     def deal_first_eight(self):
         # Deal 8 cards first (allow Grand Tichu declaration)
-        for _ in range(8):
-            for p in self.players:
-                p.receive_card(self.deck.pop())
+        for seat, p in enumerate(self.players):
+            p.receive_cards(dealer.first_eight(self.deck, seat))
+        self.deck = self.deck[dealer.FIRST_DEAL * len(self.players):]
 
         self.send_hands_to_players()
-        self.socketio.emit("call_grand_tichu")
+        self.notify(GrandTichuRequested())
 
     def deal_remaining_cards(self):
         # Deal remaining 6 cards
-        for _ in range(6):
-            for player in self.players:
-                player.receive_card(self.deck.pop())
+        rest = dealer.HAND_SIZE - dealer.FIRST_DEAL
+        for seat, player in enumerate(self.players):
+            player.receive_cards(self.deck[rest * seat:rest * (seat + 1)])
+        self.deck = []
 
         for player in self.players:
-            print(player.hand)
+            log.debug("dealt player=%s hand=%s", player.name, player.hand)
 
         self.start_passing_phase()
 
     def start_passing_phase(self):
         for player in self.players:
-            cards_data = [{"id": card.id, "image": "static/cards/" + card_to_filename(card)} for card in player.hand]
             targets = [p.name for p in self.players if p != player]
-            self.socketio.emit(
-                "start_passing",
-                {"cards": cards_data, "targets": targets},
-                room=player.sid  # nur an diesen Spieler
-            )
+            self.notify(PassingStarted(player, targets))     # nur an diesen Spieler
 
-    def start_new_round(self):
+    def start_new_round(self, seed=None, deal=None):
+        """
+        Deals the round from seed (by default the next seed of the table) or from
+        a prepared deal, 56 card indices as produced by dealer.deal_batch().
+        """
         # reset game
+        self.round_number += 1
         self.pass_count = 0
         self.current_trick = []
         self.finished_players = []
-        self.deck = create_tichu_deck()
-        # reset deck
-        random.shuffle(self.deck)
+        self.waiting_for_wish = False   # a Mah Jong that ended the last round
+        self.wish = None
+        # the seed (or the whole prepared deal) is logged so the round can be replayed
+        if deal is None:
+            if seed is None:
+                self.round_seed, deal = self.dealer.next_deal()
+            else:
+                self.round_seed, deal = seed, dealer.shuffled(seed)
+            self.record("round", self.round_seed)
+        else:
+            self.round_seed = None
+            deal = [int(i) for i in deal]
+            self.record("deal", deal)
+        self.deck = [DECK[i] for i in deal]
         for player in self.players:
             player.reset_for_new_round()
 
@@ -106,37 +155,370 @@ class TichuGame:
 
     def valid_play(self, cards_to_play):
         combo = Combo(cards_to_play, self)
-        combo_type = combo.identify_combo_type()
+        combo_type = combo.type
         if combo_type == "invalid":
-            print("This is not a valid Combo!")
+            log.debug("play rejected reason=invalid_combo cards=%s", cards_to_play)
             return False
         else:
             current_player = self.get_current_player()
             if self.wish in [c.name for c in current_player.hand] and self.wish not in [c.name for c in cards_to_play]:
-                print("Wish has to be fulfilled!")
+                log.debug("play rejected reason=wish wish=%s cards=%s", self.wish, cards_to_play)
                 return False
             elif self.current_trick:
                 current_combo = self.current_trick[-1]["combo"]
-                current_combo_type = current_combo.identify_combo_type()
-                if current_combo_type == combo_type:
-                    if (current_combo_type in ["pair_sequence", "straight"]) and (len(current_combo.cards) != len(combo.cards)):
-                        return False
-                    elif combo.rank > current_combo.rank:
-                        return True
-                    else:
-                        return False
-                # 4er bomb wins except vs straight bomb, 4er vs 4er is handled above
-                if combo_type == "bomb_4kind":
-                    if "bomb" not in current_combo_type:
-                        return True
-                    else:
-                        return False
-                # straight bomb wins bc straight bomb vs straight bomb is handled above
-                if combo_type == "bomb_straight":
-                    return True
+                return beats(combo.type, combo.rank, combo.length,
+                             current_combo.type, current_combo.rank, current_combo.length)
             else:
                 return True
 
+    def legal_moves(self, player):
+        """
+        Yields every play (list of cards) the player could make right now.
+        Players who are not on turn can only interrupt with a bomb.
+        """
+        top = self.current_trick[-1]["combo"] if self.current_trick else None
+        bombs_only = player is not self.get_current_player()
+        return moves.legal_moves(player.hand, top, self.wish, bombs_only=bombs_only)
+
+    # === Actions ===
+    # Every action validates, changes the state and records events in the outbox.
+    # Rule violations raise ValueError with the message for the player.
+
+    def start(self):
+        self.start_new_round()
+        # Send initial hands to each player
+        self.send_hands_to_players()
+        self.message("All cards have been dealt. Begin passing phase.")
+        self.send_turn_update()
+
+    def start_next_round(self):
+        if self.winner is not None:
+            raise ValueError("The match is over.")
+        if not self.is_round_over():
+            raise ValueError("The round is still being played.")
+        self.start_new_round()
+        self.send_hands_to_players()
+        self.message(f"Runde {self.round_number} beginnt!")
+
+    def grand_tichu_choice(self, player, choice):
+        if player.called_grand_tichu is not None:
+            raise ValueError("You have made your Grand Tichu decision already.")
+        if not isinstance(choice, bool):
+            raise ValueError("The Grand Tichu choice is yes or no.")
+        self.record("grand", self.players.index(player), choice)
+        player.called_grand_tichu = choice
+        if choice:
+            self.message(f"{player.name} declares a GRAND Tichu!")
+        else:
+            self.message(f"{player.name} reaches for their cards.")
+
+        # Prüfen ob alle entschieden haben
+        if all(p.called_grand_tichu is not None for p in self.players):
+            self.deal_remaining_cards()
+            self.send_hands_to_players()
+
+    def is_passing_phase(self):
+        return (all(p.called_grand_tichu is not None for p in self.players)
+                and not all(p.passed_cards for p in self.players))
+
+    def call_tichu(self, player):
+        if player.called_tichu or player.called_grand_tichu:
+            raise ValueError("You have called Tichu already.")
+        if player.has_played or self.is_round_over():
+            raise ValueError("Tichu can only be called before you play your first card.")
+        self.record("tichu", self.players.index(player))
+        player.called_tichu = True
+        self.message(f"{player.name} has called Tichu!")
+
+    def pass_cards(self, from_player, assignments):
+        """assignments: {target player name: card}, one card for each of the other three players"""
+        if not self.is_passing_phase():
+            raise ValueError("Cards are passed after the Grand Tichu decisions, before the first play.")
+        if from_player.passed_cards:
+            raise ValueError("You have passed your cards already.")
+        others = {p.name for p in self.players if p is not from_player}
+        if set(assignments) != others:
+            raise ValueError("Pass one card to each of the other three players.")
+        cards = list(assignments.values())
+        if len({card.index for card in cards}) != len(cards) or not all(from_player.has_card(c) for c in cards):
+            raise ValueError("Pass three different cards of your hand.")
+
+        from_player.passed_cards = True
+        passed = []
+        for target_name, card in assignments.items():
+            from_player.remove_cards([card])
+            target_player = self.get_player_by_name(target_name)
+            target_player.receive_card(card)
+            target_player.passing_info.append({"card": card, "player": from_player.name})
+            passed.append([self.players.index(target_player), card.index])
+        self.record("pass_cards", self.players.index(from_player), passed)
+
+        if all(player.passed_cards for player in self.players):
+            self.notify(PassingComplete())
+            # Jetzt geht's mit normalem Spielstart weiter
+            self.set_starting_player_index()
+            self.notify(TurnMessage(f"{self.players[self.turn_index]} starts next trick."))
+            self.send_hands_to_players()
+            self.send_turn_update()
+            for p in self.players:
+                for entry in p.passing_info:
+                    message = f"You received {entry['card']} from {entry['player']}"
+                    self.message(message, to=p)
+
+    def play_cards(self, player, cards):
+        if self.get_current_player() != player:
+            raise ValueError("Not your turn!")
+
+        if player in self.finished_players:
+            self.record("skip", self.players.index(player))
+            self.advance_turn()
+            raise ValueError("You are finished already!")
+
+        with metrics.timer("combo_validation_seconds"):
+            valid = self.valid_play(cards)
+        if not valid:
+            raise ValueError("Invalid play!")
+        self.record("play", self.players.index(player), cardmask.card_indices(cards))
+
+        self.pass_count = 0  # sobald jemand spielt, werden Pässe zurückgesetzt
+        player.has_played = True
+        self.wish = None
+
+        if any(c.name.lower() == "dog" for c in cards):
+            partner = [p for p in self.players if p.team == player.team and p != player][0]
+            base_version = player.hand_version
+            player.remove_cards(cards)
+            self.notify(HandDelta(player, base_version, removed=cards))
+            if len(player.hand) == 0 and self.finish_player(player):
+                return
+            self.advance_turn()
+            self.advance_turn()
+            # TODO: das muss noch ordentlich implementiert werden
+            self.message(f"{player.name} plays the Dog! Turn goes to {partner.name}.")
+            self.send_turn_update()
+            return
+
+        if any(c.name.lower() == "mah jong" for c in cards):
+            # asked for once the Mah Jong is in the trick, wish_player() finds its player there
+            self.waiting_for_wish = True
+            self.notify(WishRequested(player))
+
+        base_version = player.hand_version
+        player.remove_cards(cards)
+        self.notify(HandDelta(player, base_version, removed=cards))
+        self.current_trick.append({'combo': Combo(cards, self), 'player': player})
+        if len(player.hand) == 0 and self.finish_player(player):
+            return
+
+        # Broadcast the played cards to all
+        self.notify(CardsPlayed(player, cards))
+        if len(cards) == 1 and cards[0].name.lower() == "phoenix":
+            rank = self.current_trick[-1]["combo"].rank
+            self.message(f"Phoenix was played as single with rank: {rank}")
+
+        self.advance_turn()
+        self.send_turn_update()
+
+    def finish_player(self, player):
+        """Marks a player without cards as finished, returns True if that ends the round."""
+        self.finished_players.append(player)
+        if len(self.finished_players) >= len(self.players) - 1:
+            round_points = self.calculate_round_points()
+            self.notify(RoundOver(self.team_scores, round_points, self.round_result(round_points)))
+            if self.check_match_end() is None:
+                self.dealer.prepare()   # shuffled while the scores are shown
+            if self.journal is not None:
+                self.journal.flush()
+            return True
+        return False
+
+    def pass_turn(self, player):
+        if self.get_current_player() != player:
+            raise ValueError("Not your turn!")
+
+        if not self.current_trick:
+            raise ValueError("Nothing to pass on yet.")
+        self.record("pass", self.players.index(player))
+
+        self.pass_count += 1
+        self.message(f"{player.name} has passed.")
+
+        if self.pass_count < (len(self.players) - len(self.finished_players)):
+            self.advance_turn()
+            self.send_turn_update()
+            return
+
+        # Trick endet, letzter Spieler gewinnt
+        winning_combo = self.current_trick[-1]["combo"]
+        winner = self.current_trick[-1]["player"]
+        self.notify(TrickWon(winner, winning_combo))
+
+        if winning_combo.contains_dragon and len(self.finished_players) < 3:
+            self.dragon_possible_recipients = [p.name for p in self.players if p.team != winner.team]
+            self.waiting_for_dragon_choice = True
+            self.dragon_winner = winner
+            self.notify(DragonChoiceRequested(winner, self.dragon_possible_recipients))
+            return
+
+        winner.add_trick(self.trick_mask())
+        self.end_trick(winner)
+
+    def give_dragon_trick(self, player, recipient_name):
+        winner = self.dragon_winner
+        if not self.waiting_for_dragon_choice or player is not winner:
+            raise ValueError("Only the winner of the Dragon trick gives it away.")
+        if recipient_name not in self.dragon_possible_recipients:
+            raise ValueError("Invalid recipient")
+        self.record("dragon", self.players.index(self.get_player_by_name(recipient_name)))
+
+        # Stich geben
+        recipient = self.get_player_by_name(recipient_name)
+        recipient.add_trick(self.trick_mask())
+        self.message(f"{winner.name} gives the Dragon trick to {recipient.name}.")
+
+        # Aufräumen
+        self.waiting_for_dragon_choice = False
+        self.dragon_winner = None
+        self.dragon_possible_recipients = None
+        self.end_trick(winner)
+
+    def trick_mask(self):
+        """Card mask of all combos of the current trick."""
+        mask = 0
+        for trick in self.current_trick:
+            mask |= trick["combo"].mask
+        return mask
+
+    def end_trick(self, winner):
+        self.current_trick = []
+        self.pass_count = 0
+
+        # Winner spielt weiter, ist er schon fertig, der nächste Spieler, der noch Karten hat
+        index = self.players.index(winner)
+        for offset in range(len(self.players)):
+            next_player = self.players[(index + offset) % len(self.players)]
+            if next_player not in self.finished_players:
+                self.turn_index = self.players.index(next_player)
+                self.notify(TurnMessage(f"{next_player.name} starts next trick."))
+                break
+        self.send_turn_update()
+
+    def wish_player(self):
+        """The player who owes the wish for the Mah Jong they played, None if the game does not wait for one."""
+        if not self.waiting_for_wish:
+            return None
+        return next((t["player"] for t in reversed(self.current_trick) if t["combo"].mask & cardmask.MAHJONG_BIT),
+                    None)
+
+    def set_wish(self, player, wish):
+        if player is not self.wish_player():
+            raise ValueError("Only the player of the Mah Jong makes a wish, right after playing it.")
+        if wish != "None" and wish not in RANK_NAMES:
+            raise ValueError("Wish for a rank from 2 to A, or None.")
+        self.record("wish", wish)
+        self.waiting_for_wish = False
+        if wish == "None":
+            self.message("Nothing was wished for.")
+            return
+        self.wish = wish
+        self.message(f"Wish for {wish}.")
+
+    def snapshot(self, player):
+        """Full state as seen by one player, sent after a reconnect or when a client lost track."""
+        return dict(self.public_snapshot(), hand=cardmask.card_indices(player.hand), version=player.hand_version)
+
+    def prompts(self, player):
+        """The prompt events the game still waits on from player, sent again after a reconnect."""
+        if player.called_grand_tichu is None:
+            return [GrandTichuRequested(player)]
+        if any(p.called_grand_tichu is None for p in self.players):
+            return []
+        if not player.passed_cards:
+            return [PassingStarted(player, [p.name for p in self.players if p != player])]
+        if self.is_round_over():
+            return []
+        if self.waiting_for_dragon_choice and self.dragon_winner is player:
+            return [DragonChoiceRequested(player, self.dragon_possible_recipients)]
+        if self.wish_player() is player:
+            return [WishRequested(player)]
+        return []
+
+    def public_snapshot(self):
+        """The state everybody at the table sees, for spectators."""
+        top = self.current_trick[-1] if self.current_trick else None
+        return {
+            "trick": {
+                "cards": cardmask.card_indices(top["combo"].cards) if top else [],
+                "player": top["player"].name if top else None,
+            },
+            "current": self.get_current_player().name,
+            "players": [{"name": p.name, "team": p.team, "cards": len(p.hand), "finished": p in self.finished_players,
+                         "points": p.trick_points} for p in self.players],
+            "scores": self.team_scores,
+            "round": self.round_number,
+            "target": self.target_score,
+            "winner": self.winner,
+            "wish": self.wish,
+        }
+
+    def to_dict(self):
+        """Plain (JSON-serializable) state, cards as deck indices, players as seat numbers."""
+        seat = {p: i for i, p in enumerate(self.players)}
+        return {
+            "room": self.room,
+            "players": [p.to_dict() for p in self.players],
+            "deck": cardmask.card_indices(self.deck),
+            "turn_index": self.turn_index,
+            "round_number": self.round_number,
+            "finished_players": [seat[p] for p in self.finished_players],
+            "current_trick": [[cardmask.card_indices(t["combo"].cards), seat[t["player"]]] for t in self.current_trick],
+            "waiting_for_wish": self.waiting_for_wish,
+            "wish": self.wish,
+            "waiting_for_dragon_choice": self.waiting_for_dragon_choice,
+            "dragon_winner": seat[self.dragon_winner] if self.dragon_winner else None,
+            "dragon_possible_recipients": self.dragon_possible_recipients,
+            "team_scores": dict(self.team_scores),
+            "pass_count": self.pass_count,
+            "target_score": self.target_score,
+            "winner": self.winner,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        players = [TichuPlayer.from_dict(p) for p in state["players"]]
+        teams = [p.team for p in players]
+        game = cls(players, room=state["room"], target_score=state["target_score"])
+        for player, team in zip(players, teams):
+            player.team = team
+        game.deck = cardmask.cards_from_indices(state["deck"])
+        game.turn_index = state["turn_index"]
+        game.round_number = state["round_number"]
+        game.finished_players = [players[i] for i in state["finished_players"]]
+        # one by one, a Phoenix single takes its rank from the combo before it
+        for indices, seat in state["current_trick"]:
+            cards = cardmask.cards_from_indices(indices)
+            game.current_trick.append({"combo": Combo(cards, game), "player": players[seat]})
+        game.waiting_for_wish = state["waiting_for_wish"]
+        game.wish = state["wish"]
+        game.waiting_for_dragon_choice = state["waiting_for_dragon_choice"]
+        game.dragon_winner = players[state["dragon_winner"]] if state["dragon_winner"] is not None else None
+        game.dragon_possible_recipients = state["dragon_possible_recipients"]
+        game.team_scores = dict(state["team_scores"])
+        game.pass_count = state["pass_count"]
+        game.winner = state["winner"]
+        return game
+
+    def to_bytes(self):
+        """Compact binary snapshot, see game_logic/snapshot.py."""
+        return snapshot.dumps(self)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return snapshot.loads(data, cls)
+
+    def get_player_by_name(self, player_name):
+        return self.players_by_name.get(player_name)
+
     def get_combo_player(self, combo_obj):
         for item in reversed(self.current_trick):
             if item['combo'] == combo_obj:
@@ -151,15 +533,8 @@ class TichuGame:
                     round_points[p.team] += 100
             # points for cards won
             else:
-                points = 0
-                for trick in p.tricks_won:
-                    if isinstance(trick, TichuCard):
-                        trick = [trick]  # in Liste packen
-                    print(trick)
-                    for c in trick:
-                        print(c)
-                        points += c.points
-                #points = sum([c.points for c in [trick for trick in p.tricks_won]])
+                points = p.trick_points
+                log.debug("trick points player=%s points=%s", p.name, points)
                 # last players hand goes to opposing team and their points go to the first player
                 if p not in self.finished_players:
                     round_points[self.finished_players[0].team] += points
@@ -185,6 +560,34 @@ class TichuGame:
         self.team_scores["B"] += round_points["B"]
         return round_points
 
+    def check_match_end(self):
+        """Ends the match once a team reached the target score and leads, returns the winning team."""
+        a, b = self.team_scores["A"], self.team_scores["B"]
+        if self.winner is None and max(a, b) >= self.target_score and a != b:
+            self.winner = "A" if a > b else "B"
+            self.message(f"Team {self.winner} wins the match {a}:{b}!")
+            self.notify(MatchOver(self.winner, self.team_scores))
+        return self.winner
+
+    def round_result(self, round_points):
+        """What the results store keeps of a finished round (see results_store.py)."""
+        first = self.finished_players[0]
+        return {
+            "round": self.round_number,
+            "points": dict(round_points),
+            "scores": dict(self.team_scores),
+            "double_win": first.team if self.finished_players[1].team == first.team else None,
+            "players": [{
+                "name": p.name,
+                "team": p.team,
+                "bot": p.bot,
+                "place": self.finished_players.index(p) + 1 if p in self.finished_players else None,
+                "trick_points": p.trick_points,
+                "call": "grand" if p.called_grand_tichu else "tichu" if p.called_tichu else None,
+                "call_made": p is first,
+            } for p in self.players],
+        }
+
 
 if __name__ == "__main__":
     game = TichuGame([TichuPlayer(name) for name in ["Alice", "Bob", "Clara", "David"]], None)
@@ -196,8 +599,59 @@ if __name__ == "__main__":
     for player in game.players:
         for _ in range(10):
             player.hand.append(game.deck.pop())
-        player.add_trick(c for c in player.hand)
+        player.add_trick(cardmask.to_mask(player.hand))
         print(player.name, player.team)
-        print(player.tricks_won)
+        print(player.trick_points)
     round_points = game.calculate_round_points()
     print(round_points)
+
+    # actions out of turn, phase or range are rejected and leave no trace in the game
+    from game_logic.bots import GreedyBot
+
+    def rejected(action, *args):
+        try:
+            action(*args)
+        except ValueError:
+            return True
+        return False
+
+    checked = set()
+    for seed in range(200):
+        game = TichuGame([TichuPlayer(name) for name in ["Alice", "Bob", "Clara", "David"]], seed=seed)
+        bot = GreedyBot(random.Random(seed))
+        game.start()
+        for p in game.players:
+            game.grand_tichu_choice(p, False)
+        for p in game.players:
+            game.pass_cards(p, bot.choose_pass_cards(game, p))
+        game.call_tichu(game.players[0])
+        assert rejected(game.call_tichu, game.players[0])
+        while not game.is_round_over():
+            if game.waiting_for_dragon_choice:
+                winner, other = game.dragon_winner, next(p for p in game.players if p is not game.dragon_winner)
+                assert rejected(game.give_dragon_trick, other, game.dragon_possible_recipients[0])
+                assert rejected(game.give_dragon_trick, winner, winner.name)
+                game.give_dragon_trick(winner, game.dragon_possible_recipients[0])
+                checked.add("dragon")
+                continue
+            player = game.get_current_player()
+            cards = bot.choose_play(game, player)
+            if cards is None:
+                game.pass_turn(player)
+                continue
+            game.play_cards(player, cards)
+            assert rejected(game.call_tichu, player)
+            if game.waiting_for_wish:
+                other = next(p for p in game.players if p is not player)
+                for wish in (7, {"rank": "A"}, "x" * 300, "Dragon"):
+                    assert rejected(game.set_wish, player, wish)
+                assert rejected(game.set_wish, other, "A")
+                game.set_wish(player, "None")
+                assert rejected(game.set_wish, player, "A")
+                game.to_bytes()
+                checked.add("wish")
+        assert rejected(game.give_dragon_trick, game.players[0], game.players[1].name)
+        if checked == {"dragon", "wish"}:
+            break
+    assert checked == {"dragon", "wish"}, checked
+    print("Wish, Dragon and Tichu actions out of turn are rejected")
@@ -0,0 +1,45 @@
+# game_logic/gamelog.py
+#
+# Append-only log of a table: the player names, the seed of every deal and
+# every accepted action, one compact JSON array per line. Players are seat
+# numbers and cards deck indices, so a whole round is a few KB.
+# game_logic/replay.py rebuilds the game from it.
+#
+#   ["table", room, [names], target score]   (older logs without the target score: 1000)
+#   ["round", seed]              ["deal", [56 cards]]   (a prepared deal, see dealer.py)
+#   ["grand", seat, choice]      ["tichu", seat]
+#   ["pass_cards", seat, [[target seat, card], ...]]
+#   ["play", seat, [cards]]      ["pass", seat]      ["skip", seat]
+#   ["wish", wish]               ["dragon", recipient seat]
+
+import json
+
+
+class GameLog:
+    """
+    Buffers the entries of one table and appends them to its file in batches,
+    after batch_size entries, at the end of a round or on an explicit flush().
+    """
+
+    def __init__(self, path, batch_size=64):
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def append(self, entry):
+        self.buffer.append(entry)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in self.buffer)
+        with open(self.path, "a") as f:
+            f.write(lines)
+        self.buffer.clear()
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
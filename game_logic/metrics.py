@@ -0,0 +1,113 @@
+# game_logic/metrics.py
+#
+# Lightweight in-process instrumentation: counters, latency histograms and
+# gauges read on demand. Recording is a few dict operations, no I/O; the server
+# renders everything in the Prometheus text format on /metrics.
+#
+#   from game_logic.metrics import metrics
+#   with metrics.timer("handler_seconds", event="play_card"): ...
+#   metrics.inc("events_sent_total", event="turn_update")
+
+import bisect
+import time
+from contextlib import contextmanager
+
+# seconds, 50 us .. 2.5 s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket that holds the q-quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> Histogram
+        self.gauges = {}        # name -> function returning the current value
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def render(self, prefix="tichu_"):
+        """Prometheus text exposition format."""
+        lines = []
+        for name, read in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            lines.append(f"{prefix}{name} {read()}")
+        for name, entries in _by_name(self.counters).items():
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for labels, value in entries:
+                lines.append(f"{prefix}{name}{_labels(labels)} {value}")
+        for name, entries in _by_name(self.histograms).items():
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for labels, h in entries:
+                seen = 0
+                for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+                    seen += n
+                    lines.append(f"{prefix}{name}_bucket{_labels(labels + (('le', bound),))} {seen}")
+                lines.append(f"{prefix}{name}_sum{_labels(labels)} {h.sum:.6f}")
+                lines.append(f"{prefix}{name}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _by_name(entries):
+    grouped = {}
+    for (name, labels), value in sorted(entries.items(), key=lambda item: item[0]):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+metrics = Metrics()    # the registry of this process
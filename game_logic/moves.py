@@ -0,0 +1,239 @@
+# game_logic/moves.py
+#
+# Legal-move generator. Instead of trying every subset of a hand, candidates
+# are built per combo family (only the families that can beat the trick on the
+# table) and checked against the cardmask classifier, so the Phoenix and Dog
+# substitutions follow exactly the same rules as Combo.
+
+from itertools import combinations, product
+from game_logic import cardmask
+from game_logic.cardmask import PHOENIX_RANK, DOG_RANK
+from game_logic.combo import beats
+
+MIN_STRAIGHT = 5
+VALUE_LINE = range(DOG_RANK, 16)        # Dog, Phoenix, Mah Jong, 2..A, Dragon
+PAIR_LINE = range(1, 16)                # ranks that can form a pair (1 and 15 only with the Phoenix)
+
+ALL_FAMILIES = ("single", "pair", "triple", "full_house", "straight", "pair_sequence")
+
+
+def group_by_rank(hand):
+    groups = {}
+    for card in hand:
+        groups.setdefault(card.rank, []).append(card)
+    return groups
+
+
+def _singles(groups, phoenix):
+    for cards in groups.values():
+        for card in cards:
+            yield [card]
+    if phoenix:
+        yield [phoenix]
+
+
+def _pairs(groups, phoenix):
+    for cards in groups.values():
+        yield from (list(c) for c in combinations(cards, 2))
+    if phoenix:
+        for cards in groups.values():
+            for card in cards:
+                yield [card, phoenix]
+
+
+def _triples(groups, phoenix):
+    for cards in groups.values():
+        yield from (list(c) for c in combinations(cards, 3))
+        if phoenix:
+            yield from (list(c) + [phoenix] for c in combinations(cards, 2))
+
+
+def _full_houses(groups, phoenix):
+    triples = [(rank, list(c), False) for rank, cards in groups.items() for c in combinations(cards, 3)]
+    pairs = [(rank, list(c), False) for rank, cards in groups.items() for c in combinations(cards, 2)]
+    if phoenix:
+        triples += [(rank, list(c) + [phoenix], True) for rank, cards in groups.items() for c in combinations(cards, 2)]
+        pairs += [(rank, [card, phoenix], True) for rank, cards in groups.items() for card in cards]
+    for t_rank, t_cards, t_phoenix in triples:
+        for p_rank, p_cards, p_phoenix in pairs:
+            if t_rank != p_rank and not (t_phoenix and p_phoenix):
+                yield t_cards + p_cards
+
+
+def _straight_value_sets(groups, phoenix, length=None):
+    """
+    Yields rank sets that may form a straight: every window of the value line
+    with at most one hole, optionally leaving out one inner rank and/or adding the Phoenix.
+    """
+    present = set(groups)
+    if phoenix:
+        present.add(PHOENIX_RANK)
+    for lo in VALUE_LINE:
+        for hi in range(lo + MIN_STRAIGHT - 2, VALUE_LINE.stop):
+            window = [v for v in range(lo, hi + 1) if v in present]
+            missing = hi - lo + 1 - len(window)
+            if missing > 1:
+                break
+            options = [window]
+            if missing == 0:
+                options += [[v for v in window if v != skip] for skip in window[1:-1]]
+            if phoenix and not lo <= PHOENIX_RANK <= hi:
+                options += [values + [PHOENIX_RANK] for values in options]
+            for values in options:
+                if len(values) >= MIN_STRAIGHT and (length is None or len(values) == length):
+                    yield values
+
+
+def _straights(groups, phoenix, length=None):
+    choices = dict(groups)
+    if phoenix:
+        choices[PHOENIX_RANK] = [phoenix]
+    for values in _straight_value_sets(groups, phoenix, length):
+        for cards in product(*(choices[v] for v in values)):
+            yield list(cards)
+
+
+def _pair_sequences(groups, phoenix, length=None):
+    for lo in PAIR_LINE:
+        for hi in range(lo + 1, PAIR_LINE.stop):
+            run = range(lo, hi + 1)
+            if length is not None and 2 * len(run) != length:
+                continue
+            singles = [v for v in run if len(groups.get(v, ())) < 2]
+            if len(singles) > (1 if phoenix else 0):
+                break
+            phoenix_slots = singles or ([None] + list(run) if phoenix else [None])
+            for slot in phoenix_slots:
+                options = []
+                for v in run:
+                    if v == slot:
+                        options.append([(card, phoenix) for card in groups.get(v, ())])
+                    else:
+                        options.append(list(combinations(groups[v], 2)))
+                for pairs in product(*options):
+                    yield [card for pair in pairs for card in pair]
+
+
+def _bombs(groups):
+    for rank, cards in groups.items():
+        if len(cards) == 4:
+            yield list(cards)
+    suits = {}
+    for cards in groups.values():
+        for card in cards:
+            if card.suit:
+                suits.setdefault(card.suit, {})[card.rank] = card
+    for by_rank in suits.values():
+        ranks = sorted(by_rank)
+        for lo in range(len(ranks)):
+            for hi in range(lo + MIN_STRAIGHT - 1, len(ranks)):
+                if ranks[hi] - ranks[lo] != hi - lo:
+                    break
+                yield [by_rank[r] for r in ranks[lo:hi + 1]]
+
+
+_GENERATORS = {
+    "single": _singles,
+    "pair": _pairs,
+    "triple": _triples,
+    "full_house": _full_houses,
+    "straight": _straights,
+    "pair_sequence": _pair_sequences,
+}
+
+
+def candidates(hand, top_type=None, top_length=None, bombs_only=False):
+    """Yields card lists that may be playable, only from families that can beat top_type."""
+    groups = group_by_rank(hand)
+    phoenix = None
+    for card in groups.pop(PHOENIX_RANK, ()):
+        phoenix = card
+    if not bombs_only:
+        if top_type is None:
+            families = ALL_FAMILIES
+        else:
+            families = (top_type,) if top_type in _GENERATORS else ()
+        for family in families:
+            if family in ("straight", "pair_sequence"):
+                yield from _GENERATORS[family](groups, phoenix, top_length)
+            else:
+                yield from _GENERATORS[family](groups, phoenix)
+    yield from _bombs(groups)
+
+
+def legal_moves(hand, top=None, wish=None, bombs_only=False):
+    """
+    Yields every distinct play (list of cards) from hand that is valid on top,
+    the Combo currently on the table (None when leading).
+    Follows TichuGame.valid_play: a wished card in hand has to be played.
+    """
+    if top is not None:
+        top_type, top_rank, top_length = top.type, top.rank, top.length
+    else:
+        top_type = top_rank = top_length = None
+    must_wish = wish is not None and any(c.name == wish for c in hand)
+    seen = set()
+    for cards in candidates(hand, top_type, top_length, bombs_only):
+        mask, key = cardmask.mask_and_key(cards)
+        if mask in seen:
+            continue
+        seen.add(mask)
+        combo_type, rank, length = cardmask.classify_mask(mask, key)
+        if combo_type == "invalid" or (bombs_only and "bomb" not in combo_type):
+            continue
+        if rank is None:    # Phoenix single
+            rank = min(top_rank + 0.5, 14.5) if top is not None else 1.5
+        if top is not None and not beats(combo_type, rank, length, top_type, top_rank, top_length):
+            continue
+        if must_wish and not any(c.name == wish for c in cards):
+            continue
+        yield cards
+
+
+def brute_force_moves(hand, top=None, wish=None, bombs_only=False):
+    """Reference implementation: classifies every subset of the hand."""
+    for k in range(1, len(hand) + 1):
+        for cards in combinations(hand, k):
+            cards = list(cards)
+            combo_type, rank, length = cardmask.classify(cards)
+            if combo_type == "invalid" or (bombs_only and "bomb" not in combo_type):
+                continue
+            if rank is None:
+                rank = min(top.rank + 0.5, 14.5) if top is not None else 1.5
+            if top is not None and not beats(combo_type, rank, length, top.type, top.rank, top.length):
+                continue
+            if wish is not None and any(c.name == wish for c in hand) and not any(c.name == wish for c in cards):
+                continue
+            yield cards
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from game_logic.card import create_tichu_deck
+    from game_logic.combo import Combo
+
+    class _Table:
+        current_trick = []
+
+    rng = random.Random(42)
+    hands = []
+    for _ in range(300):
+        deck = create_tichu_deck()
+        rng.shuffle(deck)
+        hand, rest = deck[:14], deck[14:]
+        top_cards = rng.choice([[], rest[:1], rest[:2]] + [next(legal_moves(rest[:14]), [])])
+        top = Combo(top_cards, _Table()) if top_cards else None
+        if top is not None and top.type == "invalid":
+            top = None
+        hands.append((hand, top, rng.choice([None, None, "7", "A"])))
+
+    for name, generator in [("legal_moves", legal_moves), ("brute force", brute_force_moves)]:
+        start = time.perf_counter()
+        results = [sorted(cardmask.to_mask(m) for m in generator(h, t, w)) for h, t, w in hands]
+        elapsed = time.perf_counter() - start
+        print(f"{name:12s} {elapsed / len(hands) * 1000:8.3f} ms/hand  {sum(map(len, results))} moves")
+        if generator is legal_moves:
+            expected = results
+        elif results != expected:
+            print("MISMATCH between legal_moves and brute force!")
@@ -1,11 +1,15 @@
 # game_logic/tichu_player.py
 
+from game_logic import cardmask
+
 class TichuPlayer:
     def __init__(self, name, sid=None, team=None):
         self.name = name
         self.team = team  # 'A' or 'B'
         self.hand = []  # List of TichuCard objects
-        self.tricks_won = []  # List of cards won in tricks
+        self.hand_ids = set()   # card indices of the hand, for constant time lookups
+        self.tricks_won = 0   # card mask (see cardmask.py) of the cards won in tricks
+        self.trick_points = 0   # their points, added up when a trick is awarded
         self.called_tichu = False
         self.called_grand_tichu = None
         self.finished = False  # True if player is out of cards
@@ -13,41 +17,100 @@ class TichuPlayer:
         self.has_played = False
         self.passed_cards = False
         self.passing_info = []    # list of dicts with [{"card": card, "player": player.name}]
+        self.hand_version = 0     # increases with every change of the hand, clients sync against it
+        self.bot = None           # level of a server-side bot playing this seat (see bots.LEVELS), None for a human
 
     def receive_card(self, card):
         self.hand.append(card)
         self.hand.sort()
+        self.hand_ids.add(card.index)
+        self.hand_version += 1
+
+    def receive_cards(self, cards):
+        self.hand.extend(cards)
+        self.hand.sort()
+        self.hand_ids.update(card.index for card in cards)
+        self.hand_version += 1
+
+    def set_hand(self, cards):
+        self.hand = sorted(cards)
+        self.hand_ids = {card.index for card in cards}
 
     def remove_cards(self, cards):
         for card in cards:
-            if card in self.hand:
+            if card.index in self.hand_ids:
+                self.hand_ids.remove(card.index)
                 self.hand.remove(card)
             else:
                 raise ValueError(f"{card} not in hand!")
+        self.hand_version += 1
 
     def has_card(self, card):
-        return card in self.hand
+        return card.index in self.hand_ids
 
-    def add_trick(self, cards):
-        self.tricks_won.extend(cards)
+    def add_trick(self, mask):
+        """Adds the cards of a won trick, given as a card mask."""
+        self.tricks_won |= mask
+        self.trick_points += cardmask.mask_points(mask)
+
+    def set_tricks_won(self, mask):
+        self.tricks_won = mask
+        self.trick_points = cardmask.mask_points(mask)
 
     def calculate_points(self):
-        return sum(card.points for card in self.tricks_won)
+        return self.trick_points
 
     def reset_for_new_round(self):
         self.hand.clear()
-        self.tricks_won.clear()
+        self.hand_ids.clear()
+        self.hand_version += 1
+        self.tricks_won = 0
+        self.trick_points = 0
         self.called_tichu = False
         self.called_grand_tichu = None
         self.finished = False
         self.has_played = False
+        self.passed_cards = False
+        self.passing_info.clear()
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "team": self.team,
+            "sid": self.sid,
+            "hand": cardmask.card_indices(self.hand),
+            "tricks_won": list(cardmask.mask_indices(self.tricks_won)),
+            "called_tichu": self.called_tichu,
+            "called_grand_tichu": self.called_grand_tichu,
+            "finished": self.finished,
+            "has_played": self.has_played,
+            "passed_cards": self.passed_cards,
+            "passing_info": [[cardmask.card_index(e["card"]), e["player"]] for e in self.passing_info],
+            "hand_version": self.hand_version,
+            "bot": self.bot,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        player = cls(state["name"], sid=state["sid"], team=state["team"])
+        player.set_hand(cardmask.cards_from_indices(state["hand"]))
+        player.set_tricks_won(cardmask.to_mask(cardmask.cards_from_indices(state["tricks_won"])))
+        player.called_tichu = state["called_tichu"]
+        player.called_grand_tichu = state["called_grand_tichu"]
+        player.finished = state["finished"]
+        player.has_played = state["has_played"]
+        player.passed_cards = state["passed_cards"]
+        player.passing_info = [{"card": cardmask.DECK_ORDER[i], "player": name} for i, name in state["passing_info"]]
+        player.hand_version = state["hand_version"]
+        player.bot = state["bot"]
+        return player
 
     def __repr__(self):
         return f"{self.name} (Team {self.team})"
 
 
 if __name__ == "__main__":
-    from card import create_tichu_deck
+    from game_logic.card import create_tichu_deck
 
     p = TichuPlayer("Alice", team="A")
     deck = create_tichu_deck()
@@ -59,5 +122,5 @@ if __name__ == "__main__":
     print(p.hand)
 
     cards_won = [deck.pop(), deck.pop(), deck.pop(), deck.pop(), deck.pop()]
-    p.add_trick(cards_won)
+    p.add_trick(cardmask.to_mask(cards_won))
     print(f"{p.name}'s trick points: {p.calculate_points()} with cards: {cards_won}")
@@ -0,0 +1,89 @@
+# game_logic/replay.py
+#
+# Rebuilds a TichuGame from its log (see gamelog.py), to any point.
+#
+#   python -m game_logic.replay logs/ab12cd34.log               final state
+#   python -m game_logic.replay logs/ab12cd34.log --upto 120    state after the first 120 entries
+#   python -m game_logic.replay logs/*.log --bench 20           replays every log 20 times, engine speed
+
+import argparse
+import time
+from game_logic.card import DECK
+from game_logic.game import TichuGame
+from game_logic.player import TichuPlayer
+
+
+def _pass_cards(game, seat, passed):
+    game.pass_cards(game.players[seat], {game.players[target].name: DECK[card] for target, card in passed})
+
+
+def _skip(game, seat):
+    game.advance_turn()
+
+
+APPLY = {
+    "round": lambda game, seed: game.start_new_round(seed),
+    "deal": lambda game, deal: game.start_new_round(deal=deal),
+    "grand": lambda game, seat, choice: game.grand_tichu_choice(game.players[seat], choice),
+    "tichu": lambda game, seat: game.call_tichu(game.players[seat]),
+    "pass_cards": _pass_cards,
+    "play": lambda game, seat, cards: game.play_cards(game.players[seat], [DECK[i] for i in cards]),
+    "pass": lambda game, seat: game.pass_turn(game.players[seat]),
+    "skip": _skip,
+    "wish": lambda game, wish: game.set_wish(game.wish_player(), wish),
+    "dragon": lambda game, seat: game.give_dragon_trick(game.dragon_winner, game.players[seat].name),
+}
+
+
+def replay(entries, upto=None):
+    """Applies the first upto entries (all by default) and returns the game."""
+    game = None
+    for entry in entries[:upto]:
+        kind, args = entry[0], entry[1:]
+        if kind == "table":
+            room, names, *target = args
+            game = TichuGame([TichuPlayer(name) for name in names], room=room,
+                             target_score=target[0] if target else TichuGame.TARGET_SCORE)
+        else:
+            APPLY[kind](game, *args)
+        game.take_events()      # nobody is listening
+    return game
+
+
+def describe(game):
+    lines = [f"{game!r}, scores {game.team_scores}, {game.get_current_player().name} to play"]
+    for p in game.players:
+        lines.append(f"  {p.name} (Team {p.team}): {p.hand}")
+    if game.current_trick:
+        top = game.current_trick[-1]
+        lines.append(f"  on the table: {top['combo']} by {top['player'].name}")
+    return "\n".join(lines)
+
+
+def main():
+    from game_logic.gamelog import read_log
+
+    parser = argparse.ArgumentParser(description="Replay Tichu game logs")
+    parser.add_argument("logs", nargs="+")
+    parser.add_argument("--upto", type=int, help="number of log entries to apply")
+    parser.add_argument("--bench", type=int, metavar="N", help="replay every log N times and report the speed")
+    args = parser.parse_args()
+
+    logs = [read_log(path) for path in args.logs]
+    if args.bench:
+        entries = sum(len(log) for log in logs) * args.bench
+        start = time.perf_counter()
+        for _ in range(args.bench):
+            for log in logs:
+                replay(log)
+        elapsed = time.perf_counter() - start
+        print(f"{entries} entries in {elapsed:.2f}s: {entries / elapsed:.0f} actions/sec")
+        return
+
+    for path, log in zip(args.logs, logs):
+        print(f"{path}: {len(log)} entries")
+        print(describe(replay(log, args.upto)))
+
+
+if __name__ == "__main__":
+    main()
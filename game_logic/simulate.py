@@ -0,0 +1,139 @@
+# game_logic/simulate.py
+#
+# Headless simulator: plays complete rounds with bots and no Socket.IO object.
+#
+#   python -m game_logic.simulate --games 10000 --bots greedy,random,greedy,random
+#   python -m game_logic.simulate --games 1000000 --processes 0     (0 = all cores)
+
+import argparse
+import multiprocessing
+import random
+import time
+from game_logic.bots import BOTS
+from game_logic.dealer import deals
+from game_logic.game import TichuGame
+from game_logic.player import TichuPlayer
+
+MAX_ACTIONS = 2000  # a round never needs that many, guards against engine dead-locks
+
+
+def play_round(bots, seed=None, deal=None):
+    """
+    Plays one round with the given strategies (one per seat), dealt from seed or
+    a prepared deal (see dealer.py), and returns
+    (round points per team, seats in the order they went out, number of actions).
+    """
+    players = [TichuPlayer(f"Bot{i}") for i in range(len(bots))]
+    game = TichuGame(players, seed=seed)
+    seat = {p: bot for p, bot in zip(players, bots)}
+
+    game.start_new_round(deal=deal)
+    for p in players:
+        game.grand_tichu_choice(p, seat[p].choose_grand_tichu(game, p))
+    for p in players:
+        game.pass_cards(p, seat[p].choose_pass_cards(game, p))
+
+    actions = 0
+    while not game.is_round_over():
+        actions += 1
+        if actions > MAX_ACTIONS:
+            raise RuntimeError(f"Round did not finish after {MAX_ACTIONS} actions (seed {seed}).")
+        if game.waiting_for_dragon_choice:
+            winner = game.dragon_winner
+            game.give_dragon_trick(winner, seat[winner].choose_dragon_recipient(game, winner))
+            continue
+        player = game.get_current_player()
+        cards = seat[player].choose_play(game, player)
+        if cards is None:
+            game.pass_turn(player)
+            continue
+        game.play_cards(player, cards)
+        if game.waiting_for_wish:
+            game.set_wish(player, seat[player].choose_wish(game, player))
+        game.take_events()      # nobody is listening
+
+    order = [players.index(p) for p in game.finished_players]
+    return game.team_scores, order, actions     # fresh game, so the scores are this round's points
+
+
+class Stats:
+    def __init__(self):
+        self.games = 0
+        self.actions = 0
+        self.points = {"A": 0, "B": 0}
+        self.round_wins = {"A": 0, "B": 0}
+        self.first_out = {}   # seat -> count
+
+    def add_round(self, points, order, actions):
+        self.games += 1
+        self.actions += actions
+        for team in self.points:
+            self.points[team] += points[team]
+        if points["A"] != points["B"]:
+            self.round_wins["A" if points["A"] > points["B"] else "B"] += 1
+        self.first_out[order[0]] = self.first_out.get(order[0], 0) + 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.actions += other.actions
+        for team in self.points:
+            self.points[team] += other.points[team]
+            self.round_wins[team] += other.round_wins[team]
+        for seat, count in other.first_out.items():
+            self.first_out[seat] = self.first_out.get(seat, 0) + count
+        return self
+
+
+def run_chunk(args):
+    bot_names, seeds = args
+    bots = [BOTS[name](random.Random(seeds.start * len(bot_names) + i)) for i, name in enumerate(bot_names)]
+    stats = Stats()
+    # all deals of the chunk at once from the bulk dealer
+    for seed, deal in zip(seeds, deals(len(seeds), seed=seeds.start)):
+        stats.add_round(*play_round(bots, seed, deal))
+    return stats
+
+
+def simulate(games, bot_names, seed=0, processes=1, chunk_size=500):
+    """Plays games rounds, spread over processes worker processes (0 = all cores)."""
+    seeds = range(seed, seed + games)
+    chunks = [(bot_names, seeds[i:i + chunk_size]) for i in range(0, games, chunk_size)]
+    if processes == 1:
+        return _merge(map(run_chunk, chunks))
+    with multiprocessing.Pool(processes or None) as pool:
+        return _merge(pool.imap_unordered(run_chunk, chunks))
+
+
+def _merge(results):
+    total = Stats()
+    for stats in results:
+        total.merge(stats)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Tichu simulator")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--bots", default="greedy,random,greedy,random",
+                        help=f"four strategies, seat order (available: {', '.join(BOTS)})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes, 0 = all cores")
+    args = parser.parse_args()
+
+    bot_names = args.bots.split(",")
+    if len(bot_names) != 4 or any(name not in BOTS for name in bot_names):
+        parser.error("--bots needs four of: " + ", ".join(BOTS))
+
+    start = time.perf_counter()
+    stats = simulate(args.games, bot_names, args.seed, args.processes)
+    elapsed = time.perf_counter() - start
+
+    print(f"{stats.games} rounds in {elapsed:.2f}s: {stats.games / elapsed:.1f} games/sec, "
+          f"{stats.actions / elapsed:.0f} actions/sec")
+    print(f"Average points  A: {stats.points['A'] / stats.games:.1f}  B: {stats.points['B'] / stats.games:.1f}")
+    print(f"Rounds won      A: {stats.round_wins['A']}  B: {stats.round_wins['B']}")
+    print("First out by seat:", {seat: stats.first_out.get(seat, 0) for seat in range(4)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# game_logic/snapshot.py
+#
+# Compact binary snapshots of a TichuGame, for crash recovery, handing a table to
+# another worker and replays. Cards are deck indices (see cardmask.DECK_ORDER):
+# one byte per card where the order matters (deck, passed cards), a 7 byte
+# bitmask for hands, won cards and the combos of the current trick.
+#
+#   python -m game_logic.snapshot      round-trip check and size/speed benchmark
+
+import struct
+from game_logic import cardmask
+
+MAGIC = b"TG"
+VERSION = 3
+MASK_BYTES = (cardmask.NUM_CARDS + 7) // 8
+NONE = 0xFF     # "no seat" / "no string"
+MAX_TARGET_SCORE = 0xFFFF   # packed as an unsigned short
+
+_HEADER = struct.Struct("<2sB")
+_GAME = struct.Struct("<BHBBBBiiH")  # turn, round, passes, flags, dragon winner, recipients, scores A/B, target
+_PLAYER = struct.Struct("<BI")       # flags, hand version
+_TRICK = struct.Struct("<B7s")       # seat, combo mask
+
+# game flags
+WAITING_FOR_WISH = 1
+WAITING_FOR_DRAGON = 2
+
+# player flags
+CALLED_TICHU = 1
+CALLED_GRAND_TICHU = 2
+GRAND_TICHU_UNDECIDED = 4   # called_grand_tichu is still None
+FINISHED = 8
+HAS_PLAYED = 16
+PASSED_CARDS = 32
+
+
+def _mask_bytes(mask):
+    return mask.to_bytes(MASK_BYTES, "little")
+
+
+def _mask_cards(data):
+    return cardmask.cards_from_indices(cardmask.mask_indices(int.from_bytes(data, "little")))
+
+
+class _Writer:
+    def __init__(self):
+        self.buf = bytearray()
+
+    def pack(self, fmt, *values):
+        self.buf += fmt.pack(*values)
+
+    def byte(self, value):
+        self.buf.append(value)
+
+    def str(self, value):
+        if value is None:
+            self.buf.append(NONE)
+            return
+        data = value.encode()
+        if len(data) >= NONE:
+            raise ValueError(f"String too long for a snapshot: {value!r}")
+        self.buf.append(len(data))
+        self.buf += data
+
+    def cards(self, cards):
+        """Ordered card list, one byte per card."""
+        self.buf.append(len(cards))
+        self.buf += bytes(cardmask.card_indices(cards))
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def byte(self):
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def take(self, n):
+        self.pos += n
+        return bytes(self.data[self.pos - n:self.pos])
+
+    def str(self):
+        n = self.byte()
+        return None if n == NONE else self.take(n).decode()
+
+    def cards(self):
+        return cardmask.cards_from_indices(self.take(self.byte()))
+
+
+def dumps(game):
+    seat = {p: i for i, p in enumerate(game.players)}
+    seat_by_name = {p.name: i for i, p in enumerate(game.players)}
+    w = _Writer()
+    w.pack(_HEADER, MAGIC, VERSION)
+
+    recipients = game.dragon_possible_recipients
+    recipient_bits = NONE if recipients is None else sum(1 << seat_by_name[name] for name in recipients)
+    flags = (WAITING_FOR_WISH if game.waiting_for_wish else 0) | (WAITING_FOR_DRAGON if game.waiting_for_dragon_choice else 0)
+    w.pack(_GAME, game.turn_index, game.round_number, game.pass_count, flags,
+           seat[game.dragon_winner] if game.dragon_winner else NONE, recipient_bits,
+           game.team_scores["A"], game.team_scores["B"], game.target_score)
+    w.str(game.room)
+    w.str(game.wish)
+    w.str(game.winner)
+    w.cards(game.deck)
+    w.byte(len(game.finished_players))
+    w.buf += bytes(seat[p] for p in game.finished_players)
+    w.byte(len(game.current_trick))
+    for t in game.current_trick:
+        w.pack(_TRICK, seat[t["player"]], _mask_bytes(t["combo"].mask))
+
+    for p in game.players:
+        w.str(p.name)
+        w.str(p.team)
+        w.str(p.sid)
+        w.str(p.bot)
+        w.buf += _mask_bytes(cardmask.to_mask(p.hand))
+        w.buf += _mask_bytes(p.tricks_won)
+        flags = ((CALLED_TICHU if p.called_tichu else 0)
+                 | (CALLED_GRAND_TICHU if p.called_grand_tichu else 0)
+                 | (GRAND_TICHU_UNDECIDED if p.called_grand_tichu is None else 0)
+                 | (FINISHED if p.finished else 0)
+                 | (HAS_PLAYED if p.has_played else 0)
+                 | (PASSED_CARDS if p.passed_cards else 0))
+        w.pack(_PLAYER, flags, p.hand_version)
+        w.byte(len(p.passing_info))
+        for e in p.passing_info:
+            w.byte(cardmask.card_index(e["card"]))
+            w.byte(seat_by_name[e["player"]])
+    return bytes(w.buf)
+
+
+def loads(data, game_cls):
+    from game_logic.combo import Combo
+    from game_logic.player import TichuPlayer
+
+    r = _Reader(data)
+    magic, version = r.unpack(_HEADER)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} game snapshot.")
+    (turn_index, round_number, pass_count, flags, dragon_winner, recipient_bits, score_a, score_b,
+     target_score) = r.unpack(_GAME)
+    room = r.str()
+    wish = r.str()
+    winner = r.str()
+    deck = r.cards()
+    finished = list(r.take(r.byte()))
+    trick = [r.unpack(_TRICK) for _ in range(r.byte())]
+
+    players = []
+    passing = []
+    for _ in range(4):
+        player = TichuPlayer(r.str())
+        player.team = r.str()
+        player.sid = r.str()
+        player.bot = r.str()
+        player.set_hand(_mask_cards(r.take(MASK_BYTES)))
+        player.set_tricks_won(int.from_bytes(r.take(MASK_BYTES), "little"))
+        player_flags, player.hand_version = r.unpack(_PLAYER)
+        player.called_tichu = bool(player_flags & CALLED_TICHU)
+        player.called_grand_tichu = None if player_flags & GRAND_TICHU_UNDECIDED else bool(player_flags & CALLED_GRAND_TICHU)
+        player.finished = bool(player_flags & FINISHED)
+        player.has_played = bool(player_flags & HAS_PLAYED)
+        player.passed_cards = bool(player_flags & PASSED_CARDS)
+        passing.append([(r.byte(), r.byte()) for _ in range(r.byte())])
+        players.append(player)
+
+    teams = [p.team for p in players]
+    game = game_cls(players, room=room, target_score=target_score)
+    for player, team, info in zip(players, teams, passing):
+        player.team = team
+        player.passing_info = [{"card": cardmask.DECK_ORDER[i], "player": players[s].name} for i, s in info]
+    game.deck = deck
+    game.turn_index = turn_index
+    game.round_number = round_number
+    game.pass_count = pass_count
+    game.waiting_for_wish = bool(flags & WAITING_FOR_WISH)
+    game.waiting_for_dragon_choice = bool(flags & WAITING_FOR_DRAGON)
+    game.wish = wish
+    game.dragon_winner = players[dragon_winner] if dragon_winner != NONE else None
+    game.dragon_possible_recipients = (None if recipient_bits == NONE else
+                                       [p.name for i, p in enumerate(players) if recipient_bits >> i & 1])
+    game.team_scores = {"A": score_a, "B": score_b}
+    game.winner = winner
+    game.finished_players = [players[i] for i in finished]
+    # one by one, a Phoenix single takes its rank from the combo before it
+    for s, mask in trick:
+        game.current_trick.append({"combo": Combo(_mask_cards(mask), game), "player": players[s]})
+    return game
+
+
+def _sample_games(rounds, seed=0):
+    """Yields games in all kinds of states by playing rounds with bots."""
+    import random
+    from game_logic.bots import GreedyBot
+    from game_logic.game import TichuGame
+    from game_logic.player import TichuPlayer
+
+    bot = GreedyBot(random.Random(seed))
+    for n in range(rounds):
+        players = [TichuPlayer(f"Player{i}", sid=f"sid-{n}-{i}") for i in range(4)]
+        players[n % 4].bot = "medium"
+        game = TichuGame(players, room=f"table{n}", seed=seed + n)
+        game.start_new_round()
+        yield game
+        for p in players:
+            game.grand_tichu_choice(p, False)
+        yield game
+        for p in players:
+            game.pass_cards(p, bot.choose_pass_cards(game, p))
+        while not game.is_round_over():
+            yield game
+            if game.waiting_for_dragon_choice:
+                game.give_dragon_trick(game.dragon_winner, bot.choose_dragon_recipient(game, game.dragon_winner))
+                continue
+            player = game.get_current_player()
+            cards = bot.choose_play(game, player)
+            if cards is None:
+                game.pass_turn(player)
+            else:
+                game.play_cards(player, cards)
+                if game.waiting_for_wish:
+                    yield game
+                    game.set_wish(player, "None")
+            game.take_events()
+        yield game
+
+
+def _comparable(game):
+    """to_dict() with hands and tricks as sets, their order is not part of the snapshot."""
+    state = game.to_dict()
+    for p in state["players"]:
+        p["hand"] = sorted(p["hand"])
+        p["tricks_won"] = sorted(p["tricks_won"])
+    state["current_trick"] = [[sorted(cards), seat] for cards, seat in state["current_trick"]]
+    ranks = [t["combo"].rank for t in game.current_trick]
+    return state, ranks
+
+
+if __name__ == "__main__":
+    import json
+    import time
+    from game_logic.game import TichuGame
+
+    games = 0
+    for game in _sample_games(200):
+        restored = TichuGame.from_bytes(game.to_bytes())
+        assert _comparable(restored) == _comparable(game), game.to_dict()
+        assert restored.to_bytes() == game.to_bytes()
+        games += 1
+    print(f"Round trip ok for {games} game states")
+
+    states = list(_sample_games(20))
+    blobs = [g.to_bytes() for g in states]
+    texts = [json.dumps(g.to_dict(), separators=(",", ":")) for g in states]
+    json_sizes = [len(text) for text in texts]
+    print(f"Snapshot size: {sum(map(len, blobs)) / len(blobs):.0f} bytes on average, "
+          f"max {max(map(len, blobs))} (JSON: {sum(json_sizes) / len(json_sizes):.0f})")
+
+    for name, fn in (("to_bytes", lambda: [g.to_bytes() for g in states]),
+                     ("from_bytes", lambda: [TichuGame.from_bytes(b) for b in blobs]),
+                     ("to_dict + json", lambda: [json.dumps(g.to_dict()) for g in states]),
+                     ("json + from_dict", lambda: [TichuGame.from_dict(json.loads(text)) for text in texts])):
+        repeat = 20
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {elapsed / (repeat * len(states)) * 1e6:.1f} us per table")
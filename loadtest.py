@@ -0,0 +1,263 @@
+# loadtest.py
+#
+# Drives headless Socket.IO clients (four per table) through complete rounds
+# against a locally started app.py and reports action latency, events/sec and
+# server memory per table. Needs the python-socketio client transport:
+#
+#   pip install websocket-client
+#   python loadtest.py --tables 20 --rounds 2
+#   python loadtest.py --url http://localhost:5000 --tables 5    (server already running, no memory figures)
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import socketio
+from game_logic import cardmask, moves
+from game_logic.bots import combo_order
+from game_logic.card import card_from_key
+
+STALL_SECONDS = 3
+
+
+class TopCombo:
+    """The part of a Combo legal_moves needs, rebuilt from the cards a snapshot shows."""
+
+    def __init__(self, cards):
+        self.type, rank, self.length = cardmask.classify(cards)
+        # a Phoenix single is worth half a rank more than what it beat, which the
+        # snapshot does not tell, so assume the worst
+        self.rank = 14.5 if rank is None else rank
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []     # seconds from sending an action to its acknowledgement
+        self.events = 0         # frames received by all clients
+        self.actions = 0
+        self.rejected = 0
+        self.rounds = 0
+
+    def add_latency(self, seconds, ok):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.actions += 1
+            self.rejected += not ok
+
+    def add_events(self, n):
+        with self.lock:
+            self.events += n
+
+
+class LoadClient:
+    """One seat. Plays the weakest legal combo, like GreedyBot, on a state rebuilt from snapshots."""
+
+    def __init__(self, url, name, rounds, stats, done):
+        self.url = url
+        self.table = None
+        self.joined = threading.Event()
+        self.name = name
+        self.rounds_left = rounds
+        self.stats = stats
+        self.done = done
+        self.seq = 0
+        self.passing_done = False
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("batch", self.on_batch)
+        self.sio.on("snapshot", self.on_snapshot)
+        self.sio.on("joined_table", self.on_joined)
+        self.handlers = {
+            "call_grand_tichu": lambda payload: self.act("grand_tichu_choice", {"choice": False}),
+            "start_passing": self.on_start_passing,
+            "passing_complete": self.on_passing_complete,
+            "turn_update": self.on_turn_update,
+            "ask_wish": lambda payload: self.act("wish_card", {"wish": "None"}),
+            "choose_dragon_recipient": lambda payload: self.act(
+                "dragon_recipient_selected", {"recipient": payload["recipients"][0]}),
+            "round_over": self.on_round_over,
+        }
+
+    def start(self, table=None):
+        """Opens a private table without a table code, joins the table with that code otherwise."""
+        self.sio.connect(self.url, transports=["websocket"])
+        self.sio.emit("join", {"name": self.name, "table": table} if table else {"name": self.name, "create": True})
+
+    def on_joined(self, payload):
+        self.table = payload["table"]
+        self.joined.set()
+
+    def stop(self):
+        self.sio.disconnect()
+
+    def act(self, event, data=None):
+        self.seq += 1
+        data = dict(data or {}, seq=self.seq)
+        sent = time.perf_counter()
+
+        def ack(result):
+            self.stats.add_latency(time.perf_counter() - sent, result.get("ok"))
+            if not result.get("ok") and event == "play_card":
+                self.request_snapshot()     # somebody else was faster, look again
+
+        self.sio.emit(event, data, callback=ack)
+
+    def request_snapshot(self):
+        self.sio.emit("request_snapshot")
+
+    def on_batch(self, frames):
+        self.stats.add_events(len(frames))
+        for name, payload in frames:
+            handler = self.handlers.get(name)
+            if handler:
+                handler(payload)
+
+    def on_start_passing(self, payload):
+        self.passing_done = False
+        cards = payload["cards"]
+        self.act("pass_cards", {"assignments": {target: card for target, card in zip(payload["targets"], cards)}})
+
+    def on_passing_complete(self, payload):
+        self.passing_done = True     # the turn_update that follows starts the play
+
+    def on_turn_update(self, payload):
+        if self.passing_done and payload["current"] == self.name:
+            self.request_snapshot()
+
+    def on_round_over(self, payload):
+        self.passing_done = False
+        self.rounds_left -= 1
+        if self.rounds_left > 0:
+            self.act("ready_for_next_round")
+        else:
+            self.done.set()
+
+    def on_snapshot(self, snapshot):
+        self.stats.add_events(1)
+        if not self.passing_done or snapshot["current"] != self.name or not snapshot["hand"]:
+            return
+        hand = [card_from_key(index) for index in snapshot["hand"]]
+        trick = [card_from_key(index) for index in snapshot["trick"]["cards"]]
+        top = TopCombo(trick) if trick else None
+        options = list(moves.legal_moves(hand, top, snapshot["wish"]))
+        if trick and (not options or combo_order(min(options, key=combo_order))[0]):
+            self.act("pass")
+            return
+        best = min(options, key=combo_order)
+        self.act("play_card", {"cards": [card.index for card in best]})
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def rss_kb(pid):
+    """Resident memory of a process in KB (Linux only, None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def start_server(port):
+    env = dict(os.environ, PORT=str(port))
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Server did not come up on port %d" % port)
+
+
+def run(url, tables, rounds, timeout, server=None):
+    stats = Stats()
+    clients = []
+    table_done = []
+    base_rss = rss_kb(server.pid) if server else None
+
+    start = time.perf_counter()
+    for t in range(tables):
+        dones = []
+        host = None
+        for seat in range(4):
+            done = threading.Event()
+            client = LoadClient(url, f"t{t}p{seat}", rounds, stats, done)
+            if host is None:
+                host = client
+                client.start()
+                if not client.joined.wait(10):
+                    raise RuntimeError(f"Table {t} was not opened")
+            else:
+                client.start(host.table)
+            clients.append(client)
+            dones.append(done)
+        table_done.append(dones)
+
+    peak_rss = base_rss
+    deadline = time.monotonic() + timeout
+    last_actions, last_progress = 0, time.monotonic()
+    while time.monotonic() < deadline:
+        if server:
+            peak_rss = max(peak_rss, rss_kb(server.pid) or 0)
+        if all(done.is_set() for dones in table_done for done in dones):
+            break
+        if stats.actions != last_actions:
+            last_actions, last_progress = stats.actions, time.monotonic()
+        elif time.monotonic() - last_progress > STALL_SECONDS:
+            # a turn change we did not act on, every seat looks at the table again
+            for client in clients:
+                client.request_snapshot()
+            last_progress = time.monotonic()
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - start
+    finished = sum(all(done.is_set() for done in dones) for dones in table_done)
+
+    for client in clients:
+        client.stop()
+
+    lat = [s * 1000 for s in stats.latencies]
+    print(f"{finished}/{tables} tables finished {rounds} round(s) in {elapsed:.1f}s")
+    print(f"actions: {stats.actions} ({stats.rejected} rejected), {stats.actions / elapsed:.0f} actions/sec")
+    print(f"latency: p50 {percentile(lat, 50):.1f} ms, p99 {percentile(lat, 99):.1f} ms, max {max(lat, default=0):.1f} ms")
+    print(f"events:  {stats.events} received, {stats.events / elapsed:.0f} events/sec")
+    if base_rss is not None and peak_rss is not None:
+        print(f"memory:  server {base_rss / 1024:.1f} MB idle, {peak_rss / 1024:.1f} MB peak, "
+              f"{(peak_rss - base_rss) / tables:.0f} KB per table")
+    return finished == tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the Tichu Socket.IO server")
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=1, help="rounds per table")
+    parser.add_argument("--url", help="server to test, default: start app.py on --port")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before giving up")
+    args = parser.parse_args()
+
+    server = None if args.url else start_server(args.port)
+    try:
+        ok = run(args.url or f"http://127.0.0.1:{args.port}", args.tables, args.rounds, args.timeout, server)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
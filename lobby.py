@@ -0,0 +1,69 @@
+# lobby.py
+
+import collections
+import logging
+
+log = logging.getLogger("tichu.lobby")
+
+
+class Lobby:
+    """
+    Matchmaking queue. enqueue() only appends, a background task (run()) seats the
+    waiting players in batches at the oldest open table, so every four of them
+    fill a table and a burst of joins never holds up the tables that are playing:
+    the task yields to the event loop after every table it filled.
+
+    The queue is bounded, players who disconnect while waiting are dropped
+    lazily when their turn comes, or when they make up half of the queue.
+    """
+
+    def __init__(self, seat, max_waiting=5000, batch=64, interval=0.1):
+        self.seat = seat            # seat(sid, name) seats one player, see app.py
+        self.max_waiting = max_waiting
+        self.batch = batch
+        self.interval = interval
+        self.queue = collections.deque()    # sids in the order they asked for a game
+        self.waiting = {}                   # sid -> name, still waiting
+
+    def enqueue(self, sid, name):
+        """Queues a player and returns their position."""
+        if sid not in self.waiting:
+            if len(self.waiting) >= self.max_waiting:
+                raise ValueError("Too many players are waiting, please try again in a moment.")
+            self.waiting[sid] = name
+            self.queue.append(sid)
+            if len(self.queue) > 2 * len(self.waiting) + self.batch:
+                self._compact()
+        return len(self.waiting)
+
+    def cancel(self, sid):
+        return self.waiting.pop(sid, None) is not None
+
+    def _compact(self):
+        """Drops the sids that left and repeated ones, in time linear in the queue and amortized over the appends."""
+        self.queue = collections.deque(dict.fromkeys(sid for sid in self.queue if sid in self.waiting))
+
+    def take(self):
+        """The next batch of (sid, name) of players still waiting."""
+        batch = []
+        while self.queue and len(batch) < self.batch:
+            sid = self.queue.popleft()
+            name = self.waiting.pop(sid, None)
+            if name is not None:
+                batch.append((sid, name))
+        return batch
+
+    def run(self, sleep):
+        while True:
+            batch = self.take()
+            for n, (sid, name) in enumerate(batch, 1):
+                try:
+                    self.seat(sid, name)
+                except Exception:
+                    log.exception("seating %s from the queue failed", sid)    # the next players still get seats
+                if n % 4 == 0:
+                    sleep(0)
+            sleep(self.interval if not self.queue else 0)
+
+    def __len__(self):
+        return len(self.waiting)
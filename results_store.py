@@ -0,0 +1,213 @@
+# results_store.py
+#
+# Match history and leaderboard in SQLite (one local file, standard library only).
+#
+#   TICHU_RESULTS_DB=results.db
+#
+# record_round() only puts the result of a round on a queue. A background OS thread
+# writes the queue in batches, one transaction per batch, so the event loop never
+# waits for the disk. The thread and its queue come from the unpatched threading
+# and queue modules: gunicorn's eventlet worker monkey-patches them, and a green
+# thread would run every sqlite commit on the hub.
+# The same transaction adds the round to player_stats, the pre-aggregated totals
+# per player the leaderboard is read from with an index scan.
+#
+#   matches        one row per match (the game of a table), the running score and the winner
+#   rounds         one row per finished round, the points and the score after it
+#   round_players  one row per seat and round: place, card points, Tichu call and outcome
+#   player_stats   totals per player name, bots are not ranked
+
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from eventlet import patcher
+from game_logic.metrics import metrics
+
+queue = patcher.original("queue")
+threading = patcher.original("threading")
+
+log = logging.getLogger("tichu.results")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id TEXT PRIMARY KEY,
+    room TEXT NOT NULL,
+    started REAL NOT NULL,
+    updated REAL NOT NULL,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    score_a INTEGER NOT NULL DEFAULT 0,
+    score_b INTEGER NOT NULL DEFAULT 0,
+    winner TEXT
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    match TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    finished REAL NOT NULL,
+    points_a INTEGER NOT NULL,
+    points_b INTEGER NOT NULL,
+    score_a INTEGER NOT NULL,
+    score_b INTEGER NOT NULL,
+    double_win TEXT
+);
+CREATE INDEX IF NOT EXISTS rounds_match ON rounds (match);
+CREATE TABLE IF NOT EXISTS round_players (
+    round_id INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    team TEXT NOT NULL,
+    bot TEXT,
+    place INTEGER,
+    trick_points INTEGER NOT NULL,
+    call TEXT,
+    call_made INTEGER,
+    PRIMARY KEY (round_id, seat)
+);
+CREATE INDEX IF NOT EXISTS round_players_player ON round_players (player);
+CREATE TABLE IF NOT EXISTS player_stats (
+    player TEXT PRIMARY KEY,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    rounds_won INTEGER NOT NULL DEFAULT 0,
+    points INTEGER NOT NULL DEFAULT 0,
+    tichu_calls INTEGER NOT NULL DEFAULT 0,
+    tichu_made INTEGER NOT NULL DEFAULT 0,
+    grand_calls INTEGER NOT NULL DEFAULT 0,
+    grand_made INTEGER NOT NULL DEFAULT 0,
+    matches INTEGER NOT NULL DEFAULT 0,
+    matches_won INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS player_stats_rank ON player_stats (matches_won DESC, rounds_won DESC, points DESC);
+"""
+
+ADD_STATS = """
+INSERT INTO player_stats (player, rounds, rounds_won, points, tichu_calls, tichu_made, grand_calls, grand_made, updated)
+VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (player) DO UPDATE SET
+    rounds = rounds + 1,
+    rounds_won = rounds_won + excluded.rounds_won,
+    points = points + excluded.points,
+    tichu_calls = tichu_calls + excluded.tichu_calls,
+    tichu_made = tichu_made + excluded.tichu_made,
+    grand_calls = grand_calls + excluded.grand_calls,
+    grand_made = grand_made + excluded.grand_made,
+    updated = excluded.updated
+"""
+
+LEADERBOARD_COLUMNS = ("player", "matches", "matches_won", "rounds", "rounds_won", "points",
+                       "tichu_calls", "tichu_made", "grand_calls", "grand_made")
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")      # readers do not wait for the writer
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class ResultsStore:
+    """
+    Batched writer and leaderboard queries. record_round() may be called from any
+    green thread and never blocks; the queries block, call them through tpool.
+    """
+
+    def __init__(self, path, batch=200, interval=1.0, max_pending=10000):
+        self.path = path
+        self.batch = batch
+        self.interval = interval        # seconds a result waits at most before it is written
+        self.pending = queue.Queue(max_pending)
+        with closing(connect(path)) as db:
+            db.executescript(SCHEMA)
+        self.writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self.writer.start()
+
+    def record_round(self, match, room, result):
+        """Queues a round result (see TichuGame.round_result()) of the match of a table."""
+        self._queue(self._write_round, match, room, time.time(), result)
+
+    def record_match(self, match, winner, scores, players):
+        """Queues the end of a match, players are (name, team, bot level or None) of the seats."""
+        self._queue(self._write_match, match, winner, scores, players, time.time())
+
+    def _queue(self, write, *args):
+        try:
+            self.pending.put_nowait((write, args))
+        except queue.Full:
+            metrics.inc("results_dropped_total")
+            log.warning("results queue full, %s dropped", write.__name__)
+
+    def _write_loop(self):
+        db = connect(self.path)
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch:
+                try:
+                    item = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.pending.put(None)      # stop after this batch
+                    break
+                batch.append(item)
+            try:
+                with metrics.timer("results_write_seconds"), db:
+                    for write, args in batch:
+                        write(db, *args)
+                metrics.inc("results_written_total", len(batch))
+            except sqlite3.Error:
+                log.exception("writing %d round results failed", len(batch))
+        db.close()
+
+    def _write_round(self, db, match, room, finished, result):
+        points, scores = result["points"], result["scores"]
+        db.execute("INSERT INTO matches (id, room, started, updated) VALUES (?, ?, ?, ?) ON CONFLICT (id) DO NOTHING",
+                   (match, room, finished, finished))
+        db.execute("UPDATE matches SET updated = ?, rounds = rounds + 1, score_a = ?, score_b = ? WHERE id = ?",
+                   (finished, scores["A"], scores["B"], match))
+        round_id = db.execute(
+            "INSERT INTO rounds (match, round, finished, points_a, points_b, score_a, score_b, double_win)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (match, result["round"], finished, points["A"], points["B"], scores["A"], scores["B"],
+             result["double_win"])).lastrowid
+        db.executemany(
+            "INSERT INTO round_players (round_id, seat, player, team, bot, place, trick_points, call, call_made)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(round_id, seat, p["name"], p["team"], p["bot"], p["place"], p["trick_points"], p["call"],
+              p["call_made"] if p["call"] else None) for seat, p in enumerate(result["players"])])
+        other = {"A": "B", "B": "A"}
+        db.executemany(ADD_STATS, [
+            (p["name"], int(points[p["team"]] > points[other[p["team"]]]), points[p["team"]],
+             int(p["call"] == "tichu"), int(p["call"] == "tichu" and p["call_made"]),
+             int(p["call"] == "grand"), int(p["call"] == "grand" and p["call_made"]), finished)
+            for p in result["players"] if not p["bot"]])
+
+    def _write_match(self, db, match, winner, scores, players, finished):
+        db.execute("UPDATE matches SET winner = ?, score_a = ?, score_b = ?, updated = ? WHERE id = ?",
+                   (winner, scores["A"], scores["B"], finished, match))
+        db.executemany("UPDATE player_stats SET matches = matches + 1, matches_won = matches_won + ?, updated = ?"
+                       " WHERE player = ?",
+                       [(int(team == winner), finished, name) for name, team, bot in players if not bot])
+
+    def leaderboard(self, limit=20):
+        """The best players, by matches won, rounds won and points. Blocks, see the class docstring."""
+        with closing(connect(self.path)) as db:
+            rows = db.execute(f"SELECT {', '.join(LEADERBOARD_COLUMNS)} FROM player_stats"
+                              " ORDER BY matches_won DESC, rounds_won DESC, points DESC LIMIT ?", (limit,))
+            return [dict(zip(LEADERBOARD_COLUMNS, row)) for row in rows]
+
+    def player(self, name):
+        """The totals of one player, None if they never finished a round. Blocks."""
+        with closing(connect(self.path)) as db:
+            row = db.execute(f"SELECT {', '.join(LEADERBOARD_COLUMNS)} FROM player_stats WHERE player = ?",
+                             (name,)).fetchone()
+            return dict(zip(LEADERBOARD_COLUMNS, row)) if row else None
+
+    def close(self):
+        """Writes what is queued and stops the writer."""
+        self.pending.put(None)
+        self.writer.join()
@@ -4,28 +4,73 @@ const socket = io(window.location.origin, {
 const joinDiv = document.getElementById("join");
 const gameDiv = document.getElementById("game");
 const messages = document.getElementById("messages");
+let myName = null;
+let actionSeq = 0;
+
+// game actions carry a running number, the server applies each number once
+// and acknowledges it with {seq, ok}
+function sendAction(event, data = {}) {
+    data.seq = ++actionSeq;
+    socket.emit(event, data, (ack) => {
+        if (ack && !ack.ok && !ack.duplicate) console.warn(`${event} #${ack.seq} was rejected`);
+    });
+}
 
-document.getElementById("join-game-btn").addEventListener("click", () => {
-    console.log("Join button clicked!");
+document.getElementById("join-game-btn").addEventListener("click", () => joinGame({}));
+document.getElementById("create-table-btn").addEventListener("click", () => joinGame({ create: true }));
+document.getElementById("add-bots-btn").addEventListener("click", () =>
+    joinGame({ create: true, bots: document.getElementById("bot-level").value }));
+document.getElementById("join-code-btn").addEventListener("click", () =>
+    joinGame({ table: document.getElementById("table-code").value.trim() }));
+document.getElementById("watch-btn").addEventListener("click", () =>
+    joinGame({ table: document.getElementById("table-code").value.trim(), spectate: true }));
+
+// ?table=<id> in the URL fills in the code of a table to join
+const tableParam = new URLSearchParams(window.location.search).get("table");
+if (tableParam) document.getElementById("table-code").value = tableParam;
+
+// {} waits for a seat at any table, {table} joins a table by its code,
+// {create, bots} opens a private table, {table, spectate} watches one
+function joinGame(options) {
     const name = document.getElementById("player-name").value.trim();
-    const team = document.getElementById("team-select").value;
 
-    if (!name || !team) {
-        alert("Please enter your name and choose a team.");
+    if (!name) {
+        alert("Please enter your name.");
+        return;
+    }
+    if ("table" in options && !options.table) {
+        alert("Please enter the code of the table.");
         return;
     }
 
-    socket.emit("join", { name, team });
+    myName = name;
+    socket.emit("join", { name, ...options });
 
     // Overlay ausblenden
     document.getElementById("login-overlay").classList.add("hidden");
     document.getElementById("game").style.display = "flex";
-});
+}
+
+function listTables() {
+    socket.emit("list_tables", {}, data => {
+        const list = document.getElementById("open-tables");
+        list.innerHTML = "";
+        data.tables.forEach(table => {
+            const item = document.createElement("li");
+            item.textContent = `${table.table}: ${table.players.join(", ")} (${table.free} free) `;
+            const button = document.createElement("button");
+            button.textContent = "Join";
+            button.addEventListener("click", () => joinGame({ table: table.table }));
+            item.appendChild(button);
+            list.appendChild(item);
+        });
+    });
+}
 
 function submitMove() {
     const move = document.getElementById("moveInput").value.trim();
     if (move === "") return;
-    socket.emit("play_card", { move });
+    sendAction("play_card", { move });
     document.getElementById("moveInput").value = "";
 }
 
@@ -40,37 +85,135 @@ socket.on("game_message", data => logMessage(data.message));
 socket.on("game-message", data => logMessage(data.message));  // sometimes used interchangeably
 socket.on("turn_message", data => logMessage(data.message));
 socket.on("error_message", data => logMessage("⚠️ " + data.message));
+socket.on("queued", data => logMessage(`Waiting for a table (${data.position} waiting)...`));
+socket.on("joined_table", data => {
+    if (data.spectator) {
+        logMessage(`Watching table ${data.table}`);
+        return;
+    }
+    myName = data.name;  // matchmaking numbers a name that is taken at the table
+    logMessage(`Table: ${data.table}, Team ${data.team}`);
+    // the token takes the seat back after a dropped connection or a reload of the page
+    sessionStorage.setItem("tichu-session", data.token);
+});
+
+// The server sends the events of one action as a single batch: [[event, data], ...]
+socket.on("batch", frames => {
+    frames.forEach(([event, data]) => {
+        socket.listeners(event).forEach(handler => {
+            try {
+                handler(data);
+            } catch (e) {
+                console.error(`Handler for ${event} failed`, e);
+            }
+        });
+    });
+});
 
 let selectedCards = [];
+let hand = [];
+let handVersion = -1;
 
 socket.on("update_hand", data => {
+    hand = data.hand;
+    handVersion = data.version;
+    renderHand();
+});
+
+// Only the cards that changed, applied on top of the version we have
+socket.on("hand_delta", data => {
+    if (data.version <= handVersion) return;  // already contained in a newer full hand
+    if (data.base !== handVersion) {
+        socket.emit("request_snapshot");
+        return;
+    }
+    hand = hand.filter(id => !data.removed.includes(id)).concat(data.added);
+    handVersion = data.version;
+    renderHand();
+});
+
+socket.on("snapshot", data => {
+    if (data.hand) {  // spectators get the public part only
+        hand = data.hand;
+        handVersion = data.version;
+        renderHand();
+    }
+    socket.listeners("last_played").forEach(handler => handler(data.trick));
+    socket.listeners("turn_update").forEach(handler => handler({ current: data.current }));
+});
+
+// the server evicted the table after a long pause
+socket.on("table_closed", () => {
+    sessionStorage.removeItem("tichu-session");
+    logMessage("The table was closed for inactivity.");
+    document.getElementById("login-overlay").classList.remove("hidden");
+    listTables();
+});
+
+socket.on("connect", () => {
+    // after a reconnect the seat is bound to the new connection and the server sends a snapshot
+    const token = sessionStorage.getItem("tichu-session");
+    if (!token) {
+        listTables();
+        return;
+    }
+    socket.emit("resume", { token }, ack => {
+        if (!ack || !ack.ok) {
+            sessionStorage.removeItem("tichu-session");
+            document.getElementById("login-overlay").classList.remove("hidden");
+            listTables();
+            return;
+        }
+        actionSeq = Math.max(actionSeq, ack.seq);
+        myName = ack.name;
+        document.getElementById("login-overlay").classList.add("hidden");
+        document.getElementById("game").style.display = "flex";
+    });
+});
+
+// Cards arrive as integer ids and are drawn from one atlas image, CARD_ATLAS is
+// its index (frames[id] = [x, y] of the card) embedded by the page
+const CARD_HEIGHT = 120;
+
+function cardElement(id) {
+    const scale = CARD_HEIGHT / CARD_ATLAS.cell[1];
+    const [x, y] = id === null ? CARD_ATLAS.back : CARD_ATLAS.frames[id];
+    const el = document.createElement("div");
+    el.className = "card";
+    el.dataset.cardId = id;
+    el.title = id === null ? "" : CARD_ATLAS.names[id];
+    el.style.backgroundImage = `url(${CARD_ATLAS.image})`;
+    el.style.backgroundSize = `${CARD_ATLAS.size[0] * scale}px ${CARD_ATLAS.size[1] * scale}px`;
+    el.style.backgroundPosition = `-${x * scale}px -${y * scale}px`;
+    return el;
+}
+
+function renderHand() {
     const handDiv = document.getElementById("hand");
     handDiv.innerHTML = "";
     selectedCards = [];
 
-    data.hand.forEach(filename => {
-        const img = document.createElement("img");
-        img.src = "/static/cards/" + filename;
-        img.className = "card";
-        img.onclick = () => toggleCardSelection(filename, img);
-        handDiv.appendChild(img);
+    hand.forEach(id => {
+        const el = cardElement(id);
+        el.onclick = () => toggleCardSelection(id, el);
+        handDiv.appendChild(el);
     });
-});
+}
 
-function toggleCardSelection(filename, img) {
-    const index = selectedCards.indexOf(filename);
+function toggleCardSelection(id, el) {
+    const index = selectedCards.indexOf(id);
     if (index === -1) {
-        selectedCards.push(filename);
-        img.style.border = "2px solid blue";
+        selectedCards.push(id);
+        el.style.outline = "2px solid blue";
     } else {
         selectedCards.splice(index, 1);
-        img.style.border = "";
+        el.style.outline = "";
     }
 }
 
 function submitSelectedCards() {
     if (selectedCards.length === 0) return alert("No cards selected!");
-    socket.emit("play_card", { cards: selectedCards });
+    sendAction("play_card", { cards: selectedCards });
     selectedCards = [];
     document.getElementById("tichu-btn").style.display = "none";
 }
@@ -78,16 +221,11 @@ function submitSelectedCards() {
 socket.on("last_played", data => {
     const lastPlayedDiv = document.getElementById("last-played");
     lastPlayedDiv.innerHTML = "";
-    data.cards.forEach(filename => {
-        const img = document.createElement("img");
-        img.src = "/static/cards/" + filename;
-        img.className = "card";
-        lastPlayedDiv.appendChild(img);
-    });
+    data.cards.forEach(id => lastPlayedDiv.appendChild(cardElement(id)));
 });
 
 function passTurn() {
-    socket.emit("pass");
+    sendAction("pass");
 }
 
 socket.on("your_turn", data => {
@@ -102,7 +240,7 @@ socket.on("turn_update", data => {
     console.log("Turn Update received", data);
     const turnInfo = document.getElementById("turn-info");
     const current = data.current;
-    const you = data.you;
+    const you = data.you || myName;
 
     if (current === you) {
         turnInfo.textContent = "👉 Your Turn!";
@@ -127,7 +265,7 @@ socket.on('choose_dragon_recipient', data => {
         const btn = document.createElement("button");
         btn.textContent = name;
         btn.onclick = () => {
-            socket.emit('dragon_recipient_selected', { recipient: name });
+            sendAction("dragon_recipient_selected", { recipient: name });
             dragonOverlay.style.display = "none";
         };
         dragonButtonsDiv.appendChild(btn);
@@ -136,12 +274,14 @@ socket.on('choose_dragon_recipient', data => {
 });
 
 socket.on("ask_wish", () => {
-    const wish = prompt("Make your wish (2, 5, K, A or None):");
-    if (["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A", "None"].includes(wish.toUpperCase())) {
-        socket.emit("wish_card", { wish: wish.toUpperCase() });
-    } else {
-        alert("Invalid wish!");
+    const ranks = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A"];
+    const normalize = answer => (answer || "None").trim().toUpperCase();
+    let wish = normalize(prompt("Make your wish (2, 5, K, A or None):"));
+    // the game waits for the wish, so ask again until it is one
+    while (!ranks.includes(wish) && wish !== "NONE") {
+        wish = normalize(prompt("Invalid wish! Make your wish (2, 5, K, A or None):"));
     }
+    sendAction("wish_card", { wish: wish === "NONE" ? "None" : wish });
 });
 
 socket.on("round_over", data => {
@@ -153,16 +293,23 @@ socket.on("round_over", data => {
         <p>+${data.round_points.A} Punkte für Team A in dieser Runde</p>
         <p>+${data.round_points.B} Punkte für Team B in dieser Runde</p>
     `;
+    document.getElementById("ready-btn").textContent = "Ready";
     document.getElementById("round-overlay").style.display = "flex";
 });
 
+// comes right after round_over, the next ready starts a new match at the same table
+socket.on("match_over", data => {
+    document.getElementById("score-display").innerHTML += `<h3>Team ${data.winner} gewinnt das Spiel!</h3>`;
+    document.getElementById("ready-btn").textContent = "New match";
+});
+
 function readyNextRound() {
-    socket.emit("ready_for_next_round");
+    sendAction("ready_for_next_round");
     document.getElementById("round-overlay").style.display = "none";
 }
 
 function sendGrandTichu(choice) {
-    socket.emit("grand_tichu_choice", { choice: choice });
+    sendAction("grand_tichu_choice", { choice: choice });
     document.getElementById("grand-tichu-overlay").style.display = "none";
 }
 
@@ -171,25 +318,34 @@ socket.on("choose_grand_tichu", () => {
 });
 
 socket.on("call_grand_tichu", () => {
+    // a new round, the server starts it without waiting for every player after a while
+    document.getElementById("round-overlay").style.display = "none";
     showOverlay("grand-tichu-overlay");
 });
 
 document.getElementById("sendGrandTichuYes").addEventListener('click', () => {
-    socket.emit("grand_tichu_choice", {'choice': true});
+    sendAction("grand_tichu_choice", {'choice': true});
     hideOverlay("grand-tichu-overlay");
 });
 
 document.getElementById("sendGrandTichuNo").addEventListener('click', () => {
-    socket.emit("grand_tichu_choice", {'choice': false});
+    sendAction("grand_tichu_choice", {'choice': false});
     hideOverlay("grand-tichu-overlay");
 });
 
+// Estimate of the server's advisor: how often this hand goes out first
+socket.on("tichu_advice", data => {
+    const percent = Math.round(data.probability * 100);
+    const target = data.kind === "grand" ? "grand-advice" : "tichu-advice";
+    document.getElementById(target).textContent = `Advisor: goes out first in ${percent}% of ${data.samples} simulated rounds`;
+});
+
 function callTichu() {
-    socket.emit("tichu_call", { choice: true });
+    sendAction("tichu_call", { choice: true });
 }
 
 let selectedCard = null;
-let passAssignments = {}; // { targetName: cardId }
+let passAssignments = {}; // { targetName: card id }
 
 socket.on("start_passing", (data) => {
 
@@ -200,18 +356,7 @@ socket.on("start_passing", (data) => {
     // Handkarten anzeigen
     const handDiv = document.getElementById("passing-hand");
     handDiv.innerHTML = "";
-    data.cards.forEach(card => {
-        const img = document.createElement("img");
-        img.classList.add("card")
-        img.src = card.image;
-        img.dataset.cardId = card.id;
-        img.addEventListener("click", () => {
-            document.querySelectorAll("#passing-hand img").forEach(c => c.classList.remove("selected"));
-            img.classList.add("selected");
-            selectedCard = card.id;
-        });
-        handDiv.appendChild(img);
-    });
+    data.cards.forEach(id => renderCardBackToHand(id));
     updatePassSummary()
     // Ziel-Buttons dynamisch erstellen
     const targetsDiv = document.getElementById("passing-targets");
@@ -223,22 +368,20 @@ socket.on("start_passing", (data) => {
         targetBtn.textContent = targetName;
 
         targetBtn.addEventListener("click", () => {
-            if (!selectedCard) return alert("Select a card first!");
-
-            passAssignments[targetName] = selectedCard;
+            if (selectedCard === null) return alert("Select a card first!");
 
             // Falls für diesen Spieler schon eine Karte zugewiesen ist → zurück in Hand
-            if (passAssignments[targetName]) {
-                const oldCard = passAssignments[targetName];
-                renderCardBackToHand(oldCard);
-            }
+            const oldCard = passAssignments[targetName];
+            if (oldCard !== undefined) renderCardBackToHand(oldCard);
+
+            passAssignments[targetName] = selectedCard;
 
             // Markiere Button als ausgewählt
             targetBtn.classList.add("selected");
 
             // Entferne Karte aus Anzeige
-            const img = document.querySelector(`#passing-hand img[data-card-id='${selectedCard}']`);
-            if (img) img.remove();
+            const el = document.querySelector(`#passing-hand .card[data-card-id='${selectedCard}']`);
+            if (el) el.remove();
 
             selectedCard = null;
             updatePassSummary()
@@ -259,30 +402,21 @@ socket.on("start_passing", (data) => {
 
 // Bestätigung
 document.getElementById("confirm-pass").addEventListener("click", () => {
-    socket.emit("pass_cards", { assignments: passAssignments });
+    sendAction("pass_cards", { assignments: passAssignments });
     hideOverlay("passing-overlay");
     document.getElementById("left-panel").classList.remove("hidden");
 
 });
 
-function renderCardBackToHand(card) {
-    const specialCards = ["dragon", "mah jong", "phoenix", "dog"];
+function renderCardBackToHand(id) {
     const handDiv = document.getElementById("passing-hand");
-    let img = document.createElement("img");
-    if (specialCards.includes(card.toLowerCase())) {
-        img.src = `/static/cards/${card.toLowerCase()}.png`;
-    } else {
-        let [value, suit] = card.split("_");  // "8_spades" → ["8", "spades"]
-        img.src = `/static/cards/${suit}_${value}.png`;  // "spades_8.png"
-    }
-    img.classList.add("card")
-    img.dataset.card = card;
-    img.addEventListener("click", () => {
-        document.querySelectorAll("#passing-hand img").forEach(c => c.classList.remove("selected"));
-        img.classList.add("selected");
-        selectedCard = card;
+    const el = cardElement(id);
+    el.addEventListener("click", () => {
+        document.querySelectorAll("#passing-hand .card").forEach(c => c.classList.remove("selected"));
+        el.classList.add("selected");
+        selectedCard = id;
     });
-    handDiv.appendChild(img);
+    handDiv.appendChild(el);
 }
 
 function showOverlay(id) {
@@ -300,8 +434,8 @@ function updatePassSummary() {
     const summary = document.getElementById("pass-summary");
     summary.innerHTML = "";
     for (let player in passAssignments) {
-        if (passAssignments[player]) {
-            summary.innerHTML += `<p>${passAssignments[player]} → ${player}</p>`;
+        if (passAssignments[player] !== undefined) {
+            summary.innerHTML += `<p>${CARD_ATLAS.names[passAssignments[player]]} → ${player}</p>`;
         } else {
             summary.innerHTML += `<p>– → ${player}</p>`;
         }
@@ -0,0 +1,213 @@
+# table_store.py
+#
+# Shared table state for running several workers (or nodes) side by side.
+# Every action loads the table under a per-table lock, applies it and saves it back,
+# so it does not matter which worker a player's websocket is connected to.
+#
+#   TICHU_TABLE_STORE=memory           in-process, exercises the (de)serialization on one worker
+#   TICHU_TABLE_STORE=file:/tmp/tichu  file-backed, several workers on one machine, no Redis needed
+#   TICHU_TABLE_STORE=redis://host/0   several machines (needs the redis package)
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _RoomLocks:
+    """In-process lock per room, lock_factory decides if they are thread or green locks."""
+
+    def __init__(self, lock_factory):
+        self.lock_factory = lock_factory
+        self.locks = {}
+
+    def get(self, room):
+        lock = self.locks.get(room)
+        if lock is None:
+            lock = self.locks.setdefault(room, self.lock_factory())
+        return lock
+
+    def discard(self, room):
+        self.locks.pop(room, None)
+
+
+class MemoryTableStore:
+    def __init__(self, lock_factory=threading.Lock):
+        self.states = {}
+        self.open_rooms = {}
+        self.locks = _RoomLocks(lock_factory)
+
+    @contextmanager
+    def lock(self, room):
+        with self.locks.get(room):
+            yield
+
+    def load(self, room):
+        return self.states.get(room)
+
+    def save(self, room, state):
+        self.states[room] = state
+
+    def delete(self, room):
+        self.states.pop(room, None)
+        self.open_rooms.pop(room, None)
+        self.locks.discard(room)
+
+    def rooms(self):
+        return list(self.states)
+
+    def set_open(self, room, is_open):
+        if is_open:
+            self.open_rooms[room] = True
+        else:
+            self.open_rooms.pop(room, None)
+
+    def first_open(self):
+        return next(iter(self.open_rooms), None)
+
+    def open_list(self, limit):
+        return list(itertools.islice(self.open_rooms, limit))
+
+
+class FileTableStore:
+    """
+    One JSON file per table and an flock()-ed lock file next to it.
+    Actions of the same worker queue up on an in-process lock first, the flock
+    is polled without blocking so a waiting worker does not stall its event loop.
+    """
+
+    OPEN_INDEX = "_open.json"
+    POLL_INTERVAL = 0.002
+
+    def __init__(self, path, lock_factory=threading.Lock, sleep=time.sleep):
+        import fcntl
+        self.fcntl = fcntl
+        self.path = path
+        self.locks = _RoomLocks(lock_factory)
+        self.sleep = sleep
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, room, suffix=".json"):
+        return os.path.join(self.path, f"{room}{suffix}")
+
+    @contextmanager
+    def lock(self, room):
+        with self.locks.get(room), open(self._file(room, ".lock"), "w") as f:
+            while True:
+                try:
+                    self.fcntl.flock(f, self.fcntl.LOCK_EX | self.fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    self.sleep(self.POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                self.fcntl.flock(f, self.fcntl.LOCK_UN)
+
+    def load(self, room):
+        try:
+            with open(self._file(room)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, room, state):
+        tmp = self._file(room, ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, self._file(room))
+
+    def delete(self, room):
+        self.set_open(room, False)
+        self.locks.discard(room)
+        for suffix in (".json", ".lock"):
+            try:
+                os.remove(self._file(room, suffix))
+            except FileNotFoundError:
+                pass
+
+    def rooms(self):
+        return [name[:-5] for name in os.listdir(self.path) if name.endswith(".json") and name != self.OPEN_INDEX]
+
+    def set_open(self, room, is_open):
+        with self.lock("_open"):
+            rooms = self._open_rooms()
+            if is_open and room not in rooms:
+                rooms.append(room)
+            elif not is_open and room in rooms:
+                rooms.remove(room)
+            with open(os.path.join(self.path, self.OPEN_INDEX), "w") as f:
+                json.dump(rooms, f)
+
+    def first_open(self):
+        rooms = self._open_rooms()
+        return rooms[0] if rooms else None
+
+    def open_list(self, limit):
+        return self._open_rooms()[:limit]
+
+    def _open_rooms(self):
+        try:
+            with open(os.path.join(self.path, self.OPEN_INDEX)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+
+class RedisTableStore:
+    def __init__(self, url, prefix="tichu:"):
+        import redis
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    @contextmanager
+    def lock(self, room):
+        with self.redis.lock(f"{self.prefix}lock:{room}", timeout=30, blocking_timeout=10):
+            yield
+
+    def load(self, room):
+        state = self.redis.get(f"{self.prefix}table:{room}")
+        return json.loads(state) if state else None
+
+    def save(self, room, state):
+        self.redis.set(f"{self.prefix}table:{room}", json.dumps(state, separators=(",", ":")))
+
+    def delete(self, room):
+        self.redis.delete(f"{self.prefix}table:{room}")
+        self.set_open(room, False)
+
+    def rooms(self):
+        prefix = f"{self.prefix}table:"
+        return [key.decode()[len(prefix):] for key in self.redis.scan_iter(prefix + "*")]
+
+    def set_open(self, room, is_open):
+        key = f"{self.prefix}open"
+        if is_open:
+            self.redis.zadd(key, {room: self.redis.time()[0]}, nx=True)
+        else:
+            self.redis.zrem(key, room)
+
+    def first_open(self):
+        rooms = self.redis.zrange(f"{self.prefix}open", 0, 0)
+        return rooms[0].decode() if rooms else None
+
+    def open_list(self, limit):
+        return [room.decode() for room in self.redis.zrange(f"{self.prefix}open", 0, limit - 1)]
+
+
+def store_from_url(url, lock_factory=threading.Lock, sleep=time.sleep):
+    """
+    None keeps every table as live objects in this process (single worker).
+    Under eventlet pass green locks and a green sleep.
+    """
+    if not url:
+        return None
+    if url == "memory":
+        return MemoryTableStore(lock_factory)
+    if url.startswith("file:"):
+        return FileTableStore(url[len("file:"):], lock_factory, sleep)
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisTableStore(url)
+    raise ValueError(f"Unknown table store: {url}")
@@ -0,0 +1,454 @@
+# tables.py
+#
+#   python tables.py          checks that unknown table codes leave no locks behind
+
+import itertools
+import secrets
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from game_logic.game import TichuGame
+from game_logic.player import TichuPlayer
+
+
+class Table:
+    """One four-seat table, bound to a Socket.IO room."""
+
+    SEATS = 4
+    BOT_LEVEL = "medium"    # of the bot that takes over the seat of a player who left a running game
+
+    def __init__(self, room):
+        self.room = room
+        self.players = []
+        self.sid_to_player = {}
+        self.game = None
+        self.ready_players = set()
+        self.last_seq = {}      # player name -> sequence number of the last action applied
+        self.tokens = {}        # session token -> player name, a token takes the seat back after a reconnect
+        self.closed = False     # set by TableManager.evict()
+        self.last_active = time.time()  # of the last checkout, for the idle-table reaper
+        self.private = False    # not listed and not matched, reachable by its room id only
+        self.match_id = None    # of the running game, the key of its results (see results_store.py)
+
+    def is_full(self):
+        return len(self.players) >= self.SEATS
+
+    def is_empty(self):
+        return not self.players
+
+    def is_abandoned(self):
+        """True when no human is connected, only bots and seats kept for a reconnect are left."""
+        return not any(p.sid for p in self.players)
+
+    def humans(self):
+        return [p for p in self.players if not p.bot]
+
+    def check_seat(self, name):
+        """Raises ValueError if a player called name can not sit down at the table."""
+        if self.is_full():
+            raise ValueError(f"Table {self.room} is full.")
+        if any(p.name == name for p in self.players):
+            # names key the seats: session tokens, sequence numbers and the game's lookups
+            raise ValueError(f"The name {name} is already taken at this table.")
+
+    def add_player(self, player):
+        self.check_seat(player.name)
+        self.players.append(player)
+        if player.sid:
+            self.sid_to_player[player.sid] = player
+        self.assign_teams()
+
+    def assign_teams(self):
+        """Partners sit opposite each other, like TichuGame.assign_teams() does at the start."""
+        for seat, player in enumerate(self.players):
+            player.team = 'A' if seat % 2 == 0 else 'B'
+
+    def summary(self, spectators=0):
+        """What the lobby shows of an open table."""
+        return {"table": self.room, "players": [p.name for p in self.players],
+                "free": self.SEATS - len(self.players), "spectators": spectators}
+
+    def free_name(self, name):
+        """name, or name with the lowest number that makes it unique at the table."""
+        taken = {p.name for p in self.players}
+        return next(candidate for candidate in itertools.chain([name], (f"{name} {n}" for n in itertools.count(2)))
+                    if candidate not in taken)
+
+    def add_bot(self, level):
+        taken = {p.name for p in self.players}
+        name = next(f"Bot {n}" for n in range(1, self.SEATS + 1) if f"Bot {n}" not in taken)
+        player = TichuPlayer(name)
+        player.bot = level
+        self.add_player(player)
+        return player
+
+    def remove_player(self, sid):
+        """
+        Frees the seat of sid. While a game is running the seat is kept for the
+        player's session token and a bot plays it until they are back.
+        """
+        player = self.sid_to_player.pop(sid, None)
+        if player is None:
+            return None
+        self.ready_players.discard(player)
+        if self.game is None:
+            self.players.remove(player)
+            self.tokens = {token: name for token, name in self.tokens.items() if name != player.name}
+            self.assign_teams()
+        else:
+            player.sid = None
+            player.bot = self.BOT_LEVEL
+        return player
+
+    def is_idle(self, now, idle_ttl, abandoned_ttl):
+        """True when the table went unused for idle_ttl seconds, or abandoned_ttl without a connected human."""
+        ttl = abandoned_ttl if self.is_abandoned() else idle_ttl
+        return now - self.last_active > ttl
+
+    def memory_usage(self):
+        """
+        Approximate bytes of the table's per-round state by part. Cards are shared
+        flyweights, so only the containers holding them count.
+        """
+        usage = {
+            "hands": sum(sys.getsizeof(p.hand) + sys.getsizeof(p.hand_ids) for p in self.players),
+            "tricks_won": sum(sys.getsizeof(p.tricks_won) for p in self.players),
+            "passing_info": sum(_nested_size(p.passing_info) for p in self.players),
+        }
+        if self.game is not None:
+            usage["current_trick"] = _nested_size(self.game.current_trick)
+            usage["deck"] = sys.getsizeof(self.game.deck)
+            usage["outbox"] = sys.getsizeof(self.game.outbox)
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def issue_token(self, player):
+        token = f"{self.room}.{secrets.token_urlsafe(12)}"
+        self.tokens[token] = player.name
+        return token
+
+    def rebind(self, token, sid):
+        """Gives the seat of a session token to a new sid, returns (player, the sid it had) or (None, None)."""
+        name = self.tokens.get(token)
+        player = next((p for p in self.players if p.name == name), None)
+        if player is None:
+            return None, None
+        old_sid = player.sid
+        self.sid_to_player.pop(old_sid, None)     # the old connection may not have timed out yet
+        player.sid = sid
+        player.bot = None
+        self.sid_to_player[sid] = player
+        return player, old_sid
+
+    def accept_seq(self, player, seq):
+        """False if the action with this sequence number was applied already (a resent message)."""
+        if seq is None:
+            return True
+        if seq <= self.last_seq.get(player.name, 0):
+            return False
+        self.last_seq[player.name] = seq
+        return True
+
+    def to_dict(self):
+        return {
+            "room": self.room,
+            "players": [p.to_dict() for p in self.players] if self.game is None else None,
+            "game": self.game.to_dict() if self.game else None,
+            "ready": [p.name for p in self.ready_players],
+            "last_seq": self.last_seq,
+            "tokens": self.tokens,
+            "last_active": self.last_active,
+            "private": self.private,
+            "match_id": self.match_id,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        table = cls(state["room"])
+        if state["game"]:
+            table.game = TichuGame.from_dict(state["game"])
+            table.players = table.game.players
+        else:
+            table.players = [TichuPlayer.from_dict(p) for p in state["players"]]
+        table.sid_to_player = {p.sid: p for p in table.players if p.sid}
+        table.ready_players = {p for p in table.players if p.name in state["ready"]}
+        table.last_seq = dict(state["last_seq"])
+        table.tokens = dict(state["tokens"])
+        table.last_active = state["last_active"]
+        table.private = state["private"]
+        table.match_id = state["match_id"]
+        return table
+
+    def __repr__(self):
+        return f"Table({self.room}, {len(self.players)}/{self.SEATS})"
+
+
+def _nested_size(items):
+    """getsizeof of a list and of the lists and dicts in it."""
+    size = sys.getsizeof(items)
+    for item in items:
+        if isinstance(item, list):
+            size += sys.getsizeof(item)
+        elif isinstance(item, dict):
+            size += sys.getsizeof(item) + sum(sys.getsizeof(v) for v in item.values() if isinstance(v, list))
+    return size
+
+
+class TableManager:
+    """
+    Owns every table of this process.
+    All lookups (room -> table, sid -> table -> player) are dict lookups.
+
+    Every action runs inside checkout(), which holds the lock of its table, so the
+    actions of one table are applied strictly one after the other while other
+    tables are not held up. Under eventlet lock_factory has to be a green lock.
+
+    With a store (see table_store.py) the tables are shared between workers:
+    checkout() loads a table under its lock and saves it back afterwards.
+    """
+
+    SPECTATORS = 1000   # per table and worker
+
+    def __init__(self, store=None, lock_factory=threading.Lock):
+        self.store = store
+        self.lock_factory = lock_factory
+        self.tables = {}            # room -> Table (all tables, or the last loaded copy with a store)
+        self.locks = {}             # room -> lock, without a store
+        self.sid_to_room = {}       # sid -> room, sids are always local to this worker
+        self.open_tables = {}       # room -> Table, tables with free seats and no running game
+        self.watchers = {}          # room -> sids of the spectators of this worker, not part of the table state
+        self.watching = {}          # sid -> room
+
+    def new_room_id(self):
+        return uuid.uuid4().hex[:8]
+
+    def get(self, room):
+        return self.tables.get(room)
+
+    def peek(self, room):
+        """The table of room as last saved, read without its lock. Not for changes."""
+        if self.store is None:
+            return self.tables.get(room)
+        state = self.store.load(room)
+        return Table.from_dict(state) if state else None
+
+    @contextmanager
+    def checkout(self, room, create=False, touch=True):
+        """Yields the table of room (None if it does not exist) for one action."""
+        if self.store is None:
+            lock = self.locks.get(room)
+            if lock is None:
+                if not create and room not in self.tables:
+                    yield None      # codes from clients: no lock for a table that does not exist
+                    return
+                lock = self.locks.setdefault(room, self.lock_factory())
+            with lock:
+                table = self.tables.get(room)
+                if table is None and create:
+                    table = self._create(room)
+                if table is not None and touch:
+                    table.last_active = time.time()
+                yield table
+            return
+
+        with self.store.lock(room):
+            state = self.store.load(room)
+            table = Table.from_dict(state) if state else None
+            if table is None and create:
+                table = Table(room)
+                self.store.set_open(room, True)
+            if table is not None:
+                self.tables[room] = table
+                if touch:
+                    table.last_active = time.time()
+            yield table
+            if table is not None:
+                if table.is_empty() or table.closed:
+                    self.tables.pop(room, None)
+                    self.store.delete(room)
+                else:
+                    self.store.save(room, table.to_dict())
+
+    def _create(self, room):
+        table = Table(room)
+        self.tables[room] = table
+        self.open_tables[room] = table
+        return table
+
+    def find_open_room(self):
+        if self.store is not None:
+            return self.store.first_open() or self.new_room_id()
+        # dicts keep insertion order, so this is the oldest table still waiting for players
+        return next(iter(self.open_tables), None) or self.new_room_id()
+
+    def list_open(self, limit=50):
+        """Summaries of the oldest open tables, for the lobby."""
+        if self.store is None:
+            tables = itertools.islice(self.open_tables.values(), limit)
+        else:
+            states = (self.store.load(room) for room in self.store.open_list(limit))
+            tables = (Table.from_dict(state) for state in states if state)
+        return [table.summary(len(self.watchers.get(table.room, ()))) for table in tables]
+
+    def set_open(self, table, is_open):
+        if self.store is not None:
+            self.store.set_open(table.room, is_open)
+        elif is_open:
+            self.open_tables[table.room] = table
+        else:
+            self.open_tables.pop(table.room, None)
+
+    @contextmanager
+    def join(self, sid, name, room=None, private=False, enter=None):
+        """
+        Seats a new player and yields (table, player) while the table is still checked out.
+        room is the code of an existing table; without one the player gets a seat at
+        the oldest open table, or at a new private table. enter(room) is called once the
+        seat is free and before it is taken, an exception from it leaves the table as it was.
+        """
+        create = room is None
+        if create:
+            room = self.new_room_id() if private else self.find_open_room()
+        with self.checkout(room, create=create) as table:
+            if table is None:
+                raise ValueError(f"There is no table {room}.")
+            if create and not private:
+                name = table.free_name(name)    # matchmaking picked the table, not the player
+            table.check_seat(name)
+            if enter:
+                enter(table.room)
+            if table.is_empty() and private:
+                table.private = True
+                self.set_open(table, False)
+            player = TichuPlayer(name, sid=sid)
+            table.add_player(player)
+            self.sid_to_room[sid] = table.room
+            if table.is_full():
+                self.set_open(table, False)
+            yield table, player
+
+    def watch(self, sid, room):
+        """
+        Adds a spectator to the table of room and returns the table. Spectators
+        only get the public frames of the table (see dispatcher.spectator_room()),
+        so adding one neither locks nor changes the table.
+        """
+        table = self.peek(room)
+        if table is None:
+            raise ValueError(f"There is no table {room}.")
+        watchers = self.watchers.setdefault(room, set())
+        if len(watchers) >= self.SPECTATORS:
+            raise ValueError(f"Table {room} has no free spectator slot.")
+        watchers.add(sid)
+        self.watching[sid] = room
+        return table
+
+    def unwatch(self, sid):
+        """Removes a spectator, returns the room it watched or None."""
+        room = self.watching.pop(sid, None)
+        watchers = self.watchers.get(room)
+        if watchers is not None:
+            watchers.discard(sid)
+            if not watchers:
+                del self.watchers[room]
+        return room
+
+    def room_of(self, sid):
+        return self.sid_to_room.get(sid)
+
+    def lookup(self, sid):
+        table = self.tables.get(self.sid_to_room.get(sid))
+        if table is None:
+            return None, None
+        return table, table.sid_to_player.get(sid)
+
+    @contextmanager
+    def session(self, sid):
+        """Yields (table, player) of a connected sid with the table checked out."""
+        room = self.sid_to_room.get(sid)
+        if room is None:
+            yield None, None
+            return
+        with self.checkout(room) as table:
+            yield table, (table.sid_to_player.get(sid) if table else None)
+
+    @contextmanager
+    def leave(self, sid):
+        """Frees the seat of sid and yields (table, player) while the table is still checked out."""
+        room = self.sid_to_room.pop(sid, None)
+        if room is None:
+            yield None, None
+            return
+        with self.checkout(room) as table:
+            if table is None:
+                yield None, None
+                return
+            player = table.remove_player(sid)
+            if table.is_empty():
+                self.remove_table(room)
+            elif table.game is None and not table.private:
+                self.set_open(table, True)
+            yield table, player
+
+    @contextmanager
+    def resume(self, sid, token):
+        """Rebinds the seat of a session token to sid and yields (table, player), (None, None) if it is gone."""
+        room = token.partition(".")[0]
+        with self.checkout(room) as table:
+            player, old_sid = table.rebind(token, sid) if table else (None, None)
+            if player is None:
+                yield None, None
+                return
+            self.sid_to_room.pop(old_sid, None)
+            self.sid_to_room[sid] = room
+            yield table, player
+
+    def idle_rooms(self, now, idle_ttl, abandoned_ttl):
+        """Rooms of the tables of this process that look idle, evict() checks again under the lock."""
+        return [room for room, table in list(self.tables.items()) if table.is_idle(now, idle_ttl, abandoned_ttl)]
+
+    def evict(self, room, now, idle_ttl, abandoned_ttl):
+        """Removes the table of room if it is still idle and returns it, None otherwise."""
+        with self.checkout(room, touch=False) as table:
+            if table is None or not table.is_idle(now, idle_ttl, abandoned_ttl):
+                return None
+            table.closed = True
+            self.remove_table(room)
+            return table
+
+    def remove_table(self, room):
+        table = self.tables.pop(room, None)
+        self.open_tables.pop(room, None)
+        self.locks.pop(room, None)
+        if table:
+            for sid in table.sid_to_player:
+                self.sid_to_room.pop(sid, None)
+        for sid in self.watchers.pop(room, ()):
+            self.watching.pop(sid, None)
+        return table
+
+    def __len__(self):
+        return len(self.tables)
+
+
+if __name__ == "__main__":
+    manager = TableManager()
+    for n in range(10000):
+        with manager.resume(f"sid{n}", f"bogus{n}.token") as (table, player):
+            assert table is None and player is None
+        try:
+            with manager.join(f"sid{n}", "Ann", room=f"code{n}"):
+                pass
+        except ValueError:
+            pass
+    assert not manager.locks and not manager.tables, (len(manager.locks), len(manager.tables))
+
+    with manager.join("sid", "Ann") as (table, player):
+        room = table.room
+    assert list(manager.locks) == [room]
+    with manager.leave("sid"):
+        pass
+    assert not manager.locks and not manager.tables
+    print("Unknown table codes leave no locks behind")